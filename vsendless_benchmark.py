@@ -0,0 +1,375 @@
+# ==============================================================================
+# VSEndless Render Engine - Headless Benchmark Harness
+# ==============================================================================
+# Measures the VSEndless pipeline without a Blender install:
+#   extract_timeline_data -> validate_sequences -> probe_sequences ->
+#   construct_ffmpeg_command -> FFmpeg encode
+#
+# A synthetic timeline (many strips, channels, trims and image sequences) is
+# built on top of a small `bpy` shim. Source media is generated on the fly with
+# FFmpeg's lavfi testsrc2, or replaced by an FFmpeg stand-in when FFmpeg is not
+# installed (or --stand-in is given) so command building and orchestration can
+# still be timed.
+#
+# USAGE:
+#   python vsendless_benchmark.py --strips 200 --channels 3 --output bench.json
+#   python vsendless_benchmark.py --stand-in --strips 3000 --no-encode
+#   python vsendless_benchmark.py --compare bench_v2.0.0.json --output bench.json
+# ==============================================================================
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+# ==============================================================================
+# BPY SHIM
+# ==============================================================================
+# Just enough of the bpy API for the single-file engine to import, register its
+# properties and walk a sequence editor
+
+class _ShimStruct:
+    pass
+
+class _ShimScene:
+    pass
+
+def _shim_property(**kwargs):
+    # Registered properties become plain class attributes holding their default,
+    # so every shim scene starts out with the panel defaults
+    return kwargs.get("default")
+
+def install_bpy_shim(blend_dir):
+    try:
+        import bpy  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    bpy = types.ModuleType("bpy")
+    bpy.types = types.SimpleNamespace(
+        RenderEngine=type("RenderEngine", (_ShimStruct,), {}),
+        Operator=type("Operator", (_ShimStruct,), {}),
+        Panel=type("Panel", (_ShimStruct,), {}),
+        Scene=_ShimScene,
+    )
+    bpy.props = types.SimpleNamespace(**{
+        name: _shim_property for name in (
+            "StringProperty", "EnumProperty", "IntProperty", "FloatProperty", "BoolProperty",
+        )
+    })
+    bpy.utils = types.SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None)
+    bpy.data = types.SimpleNamespace(filepath=os.path.join(blend_dir, "benchmark.blend"))
+
+    def abspath(path):
+        if path.startswith("//"):
+            return os.path.join(blend_dir, path[2:])
+        return os.path.abspath(path)
+
+    bpy.path = types.SimpleNamespace(abspath=abspath)
+    bpy.app = types.SimpleNamespace(
+        background=True,
+        version=(4, 3, 0),
+        handlers=types.SimpleNamespace(
+            depsgraph_update_post=[], load_post=[], undo_post=[], redo_post=[], persistent=lambda handler: handler,
+        ),
+    )
+    sys.modules["bpy"] = bpy
+    return True
+
+# ==============================================================================
+# FFMPEG STAND-IN
+# ==============================================================================
+# Tiny ffmpeg/ffprobe replacements that honour the command line shape VSEndless
+# uses (-progress pipe:1, output path last) without decoding anything
+
+STAND_IN_FFMPEG = '''#!{python}
+import sys, os
+args = sys.argv[1:]
+output = args[-1] if args else ""
+frames = 0
+if "-frames:v" in args:
+    frames = int(args[args.index("-frames:v") + 1])
+# Capability queries (ffmpeg -encoders) end in an option, not an output file
+if output and not output.startswith("-") and output != os.devnull and not output.startswith("pipe:"):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "wb") as handle:
+        handle.write(b"\\0" * 1024)
+print(f"frame={{frames}}\\nfps=0\\nspeed=N/A\\nprogress=end", flush=True)
+'''
+
+STAND_IN_FFPROBE = '''#!{python}
+import json, sys
+if "-show_entries" in sys.argv:
+    sys.exit(0)
+print(json.dumps({{"format": {{"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "60"}}, "streams": [
+    {{"codec_type": "video", "codec_name": "h264", "profile": "High", "width": 1920, "height": 1080,
+      "pix_fmt": "yuv420p", "avg_frame_rate": "30/1", "sample_aspect_ratio": "1:1"}}]}}))
+'''
+
+def install_ffmpeg_stand_in(work_dir):
+    bin_dir = os.path.join(work_dir, "stand_in_bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    for name, template in (("ffmpeg", STAND_IN_FFMPEG), ("ffprobe", STAND_IN_FFPROBE)):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(template.format(python=sys.executable))
+        os.chmod(path, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    return bin_dir
+
+# ==============================================================================
+# SYNTHETIC TIMELINE
+# ==============================================================================
+
+def generate_movie(path, width, height, fps, seconds, stand_in):
+    if stand_in:
+        with open(path, "wb") as handle:
+            handle.write(b"\0" * 1024)
+        return
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "lavfi",
+        "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", str(fps), "-pix_fmt", "yuv420p", "-y", path
+    ], check=True)
+
+def generate_image_sequence(directory, width, height, fps, frames, stand_in):
+    os.makedirs(directory, exist_ok=True)
+    if stand_in:
+        for number in range(1, frames + 1):
+            with open(os.path.join(directory, f"frame_{number:04d}.png"), "wb") as handle:
+                handle.write(b"\0" * 64)
+        return
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "lavfi",
+        "-i", f"testsrc2=size={width}x{height}:rate={fps}",
+        "-frames:v", str(frames), "-y", os.path.join(directory, "frame_%04d.png")
+    ], check=True)
+
+BENCHMARK_CRF = 23
+
+def build_synthetic_scene(vsendless, args, media_dir):
+    rng = random.Random(args.seed)
+    fps = args.fps
+    clip_frames = args.clip_seconds * fps
+    sources = []
+    for index in range(min(args.sources, args.strips)):
+        path = os.path.join(media_dir, f"source_{index:03d}.mp4")
+        generate_movie(path, args.width, args.height, fps, args.clip_seconds, args.stand_in)
+        sources.append(path)
+    sequences = []
+    cursor = 1
+    for index in range(args.strips):
+        length = rng.randint(max(clip_frames // 4, 1), clip_frames)
+        offset = rng.randint(0, clip_frames - length)
+        channel = 1 + index % args.channels
+        start = cursor if channel == 1 else max(cursor - length // 2, 1)
+        strip = types.SimpleNamespace(
+            name=f"Movie.{index:04d}",
+            type='MOVIE',
+            filepath=sources[index % len(sources)],
+            frame_start=start - offset,
+            frame_final_start=start,
+            frame_final_end=start + length,
+            channel=channel,
+            blend_type='ALPHA_OVER' if channel > 1 else 'REPLACE',
+            blend_alpha=1.0,
+            mute=False,
+        )
+        sequences.append(strip)
+        if channel == 1:
+            cursor += length
+    for index in range(args.image_sequences):
+        directory = os.path.join(media_dir, f"images_{index:03d}")
+        generate_image_sequence(directory, args.width, args.height, fps, args.image_frames, args.stand_in)
+        start = rng.randint(1, max(cursor - args.image_frames, 1))
+        sequences.append(types.SimpleNamespace(
+            name=f"Images.{index:04d}",
+            type='IMAGE',
+            directory=directory + os.sep,
+            elements=[types.SimpleNamespace(filename=f"frame_{number:04d}.png")
+                      for number in range(1, args.image_frames + 1)],
+            frame_start=start,
+            frame_final_start=start,
+            frame_final_end=start + args.image_frames,
+            channel=args.channels + 1,
+            blend_type='ALPHA_OVER',
+            blend_alpha=1.0,
+            mute=False,
+        ))
+    scene = vsendless.bpy.types.Scene()
+    scene.name = "Benchmark"
+    scene.frame_start = 1
+    scene.frame_end = cursor - 1
+    scene.render = types.SimpleNamespace(
+        resolution_x=args.width, resolution_y=args.height, fps=fps, filepath=os.path.join(media_dir, "render"),
+    )
+    scene.sequence_editor = types.SimpleNamespace(sequences_all=sequences)
+    scene.use_hwaccel = False
+    scene.use_gpu_scaling = False
+    scene.use_gpu_denoising = False
+    # Encode throughput is measured on the CPU encoder at fixed quality, so runs
+    # on machines with and without an NVIDIA GPU compare like for like; libx264
+    # runs at its default preset (medium), VSEndless only overrides it for drafts
+    scene.vsendless_ffmpeg_codec = 'libx264'
+    scene.vsendless_draft_mode = False
+    scene.rate_control_mode = 'CRF'
+    scene.constant_quality_level = BENCHMARK_CRF
+    scene.vsendless_chunk_mode = args.chunk_mode
+    scene.vsendless_chunk_workers = args.workers
+    scene.vsendless_output_path = os.path.join(media_dir, "benchmark_output.mp4")
+    return scene
+
+# ==============================================================================
+# MEASUREMENT
+# ==============================================================================
+
+def time_stage(function, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - start)
+    return result, {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+    }
+
+def run_benchmark(vsendless, args, work_dir):
+    media_dir = os.path.join(work_dir, "media")
+    os.makedirs(media_dir, exist_ok=True)
+    setup_start = time.perf_counter()
+    scene = build_synthetic_scene(vsendless, args, media_dir)
+    setup_time = time.perf_counter() - setup_start
+    output_path = vsendless.resolve_output_path(scene)
+    timings = {}
+    timeline_data, timings["extract_timeline_data"] = time_stage(
+        lambda: vsendless.extract_timeline_data(scene), args.repeat)
+    timeline_data, timings["validate_sequences"] = time_stage(
+        lambda: vsendless.validate_sequences(timeline_data), args.repeat)
+    timeline_data, timings["probe_sequences"] = time_stage(
+        lambda: vsendless.probe_sequences(timeline_data), args.repeat)
+    command, timings["construct_ffmpeg_command"] = time_stage(
+        lambda: vsendless.construct_ffmpeg_command(scene, timeline_data, output_path), args.repeat)
+    frames = vsendless.get_timeline_frame_count(scene)
+    results = {
+        "version": vsendless.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ffmpeg": "stand-in" if args.stand_in else (shutil.which("ffmpeg") or "missing"),
+        "platform": {
+            "python": platform.python_version(),
+            "system": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenario": {
+            "strips": args.strips,
+            "channels": args.channels,
+            "sources": args.sources,
+            "image_sequences": args.image_sequences,
+            "image_frames": args.image_frames,
+            "resolution": f"{args.width}x{args.height}",
+            "fps": args.fps,
+            "frames": frames,
+            "chunk_mode": args.chunk_mode,
+            "workers": args.workers,
+            "seed": args.seed,
+            "encoder": " ".join(vsendless.get_encoder_args(scene)),
+        },
+        "setup_s": setup_time,
+        "timings": timings,
+        "command": {
+            "arguments": len(command),
+            "inputs": command.count("-i"),
+            "filtergraph_chars": len(command[command.index("-filter_complex") + 1]) if command else 0,
+        },
+    }
+    if not args.no_encode:
+        job = vsendless.create_render_job(scene, timeline_data, output_path)
+        start = time.perf_counter()
+        returncode = job.start().wait()
+        wall_time = time.perf_counter() - start
+        results["encode"] = {
+            "returncode": returncode,
+            "wall_s": wall_time,
+            "frames": frames,
+            "fps": frames / wall_time if wall_time > 0 else 0.0,
+            "error": job.error_report() if returncode != 0 else "",
+        }
+    return results
+
+def compare_results(baseline, current):
+    lines = [f"Comparing {current['version']} against {baseline.get('version', '?')}"]
+    for stage, timing in current["timings"].items():
+        previous = baseline.get("timings", {}).get(stage)
+        if not previous:
+            continue
+        change = (timing["median_s"] - previous["median_s"]) / previous["median_s"] * 100 if previous["median_s"] else 0.0
+        lines.append(f"  {stage:<26} {previous['median_s'] * 1000:9.2f} ms -> {timing['median_s'] * 1000:9.2f} ms ({change:+.1f}%)")
+    encoders = (baseline.get("scenario", {}).get("encoder"), current["scenario"].get("encoder"))
+    if encoders[0] != encoders[1]:
+        lines.append(f"  Encoder settings differ ({encoders[0]} vs {encoders[1]}), encode fps is not comparable")
+    if "encode" in current and "encode" in baseline:
+        lines.append(f"  {'encode fps':<26} {baseline['encode']['fps']:9.2f}    -> {current['encode']['fps']:9.2f}")
+    return "\n".join(lines)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Headless VSEndless render benchmark")
+    parser.add_argument("--strips", type=int, default=50, help="Number of MOVIE strips")
+    parser.add_argument("--channels", type=int, default=2, help="Channels the strips are spread over")
+    parser.add_argument("--sources", type=int, default=8, help="Distinct generated source files")
+    parser.add_argument("--clip-seconds", type=int, default=4, help="Length of each generated source")
+    parser.add_argument("--image-sequences", type=int, default=1, help="Number of IMAGE strips")
+    parser.add_argument("--image-frames", type=int, default=48, help="Frames per image sequence")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--chunk-mode", choices=("OFF", "FIXED", "STRIPS"), default="OFF")
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4))
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of each timed stage")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stand-in", action="store_true", help="Use the FFmpeg stand-in instead of FFmpeg")
+    parser.add_argument("--no-encode", action="store_true", help="Only time command construction")
+    parser.add_argument("--keep", action="store_true", help="Keep generated media and output")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Print the difference against an earlier results JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    work_dir = tempfile.mkdtemp(prefix="vsendless_bench_")
+    if not args.stand_in and not shutil.which("ffmpeg"):
+        print("[VSEndless] FFmpeg not found, using the FFmpeg stand-in")
+        args.stand_in = True
+    if args.stand_in:
+        install_ffmpeg_stand_in(work_dir)
+        # Keep the stand-in's capabilities out of the real user cache
+        os.environ["VSENDLESS_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    install_bpy_shim(work_dir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    vsendless = importlib.import_module("vsendless_singlefile")
+    try:
+        results = run_benchmark(vsendless, args, work_dir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as handle:
+            print(compare_results(json.load(handle), results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    return 0 if results.get("encode", {}).get("returncode", 0) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
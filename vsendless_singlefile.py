@@ -32,6 +32,21 @@ import os
 import subprocess
 import shutil
 import logging
+import re
+import sys
+import argparse
+import threading
+import queue
+import collections
+import time
+import hashlib
+import json
+import tempfile
+import contextlib
+import csv
+import struct
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 
 # ==============================================================================
 # CORE RENDER ENGINE
@@ -45,25 +60,36 @@ class VSEndlessRenderEngine(bpy.types.RenderEngine):
     def render(self, depsgraph):
         scene = depsgraph.scene_eval
         settings = scene
-        output_path = bpy.path.abspath(getattr(settings, 'vsendless_output_path', scene.render.filepath))
-        if not output_path.endswith(".mp4"):
-            output_path += ".mp4"
-        timeline_data = extract_timeline_data(scene)
-        timeline_data = validate_sequences(timeline_data)
+        output_path = resolve_output_path(settings)
+        self._profile = RenderProfile(output_path, getattr(scene, 'vsendless_profile_render', False))
+        timeline_data = prepare_timeline(scene, self._profile)
         if not timeline_data:
             self.report({'ERROR'}, "No valid sequences found for rendering.")
             return
-        ffmpeg_cmd = construct_ffmpeg_command(scene, timeline_data, output_path)
-        if not ffmpeg_cmd:
-            self.report({'ERROR'}, "Failed to build FFmpeg command.")
-            return
         try:
-            process = subprocess.run(ffmpeg_cmd, check=True, text=True, capture_output=True)
-            self.report({'INFO'}, f"Render complete: {output_path}")
-        except subprocess.CalledProcessError as e:
-            self.report({'ERROR'}, f"Render failed: {e.stderr}")
+            with self._profile.stage("build"):
+                process = create_render_job(scene, timeline_data, output_path)
+            if not process:
+                self.report({'ERROR'}, "Failed to build FFmpeg command.")
+                return
+            self._profile.begin_render()
+            process.start()
         except Exception as e:
             self.report({'ERROR'}, f"Unexpected error: {e}")
+            return
+        returncode = process.wait(cancel_check=self.test_break, progress_callback=self._on_progress)
+        self._profile.finish(process, returncode)
+        if process.cancelled:
+            self.report({'WARNING'}, f"Render cancelled: {output_path}")
+        elif returncode != 0:
+            self.report({'ERROR'}, f"Render failed: {process.error_report()}")
+        else:
+            self.report({'INFO'}, f"Render complete: {output_path}")
+
+    def _on_progress(self, process):
+        self._profile.sample(process)
+        self.update_progress(process.fraction)
+        self.update_stats("VSEndless", process.status_text())
 
 
 # ==============================================================================
@@ -78,6 +104,219 @@ def get_ffmpeg_path():
     ffmpeg_path = shutil.which("ffmpeg")
     return ffmpeg_path if ffmpeg_path else "ffmpeg"
 
+# ==============================================================================
+# FFMPEG CAPABILITY REGISTRY
+# ==============================================================================
+# `ffmpeg -encoders/-filters/-hwaccels` and `nvidia-smi` are queried once per
+# binary and cached on disk keyed by binary path + mtime, so render setup never
+# spawns them again until the binaries change
+
+CAPABILITY_CACHE_VERSION = 1
+SOFTWARE_ENCODER_FALLBACKS = {'h264_nvenc': 'libx264', 'hevc_nvenc': 'libx265'}
+_capability_memo = {}
+
+def get_user_cache_dir():
+    if os.environ.get("VSENDLESS_CACHE_DIR"):
+        return os.environ["VSENDLESS_CACHE_DIR"]
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "vsendless")
+
+def _binary_key(binary):
+    resolved = shutil.which(binary)
+    if not resolved:
+        return None
+    resolved = os.path.realpath(resolved)
+    signature = _file_signature(resolved)
+    return f"{resolved}|{signature[0]}" if signature else None
+
+def _load_capability_cache():
+    try:
+        with open(os.path.join(get_user_cache_dir(), "capabilities.json"), "r", encoding="utf-8") as cache_file:
+            data = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    return data.get("entries", {}) if data.get("version") == CAPABILITY_CACHE_VERSION else {}
+
+def _save_capability_cache(entries):
+    cache_dir = get_user_cache_dir()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = os.path.join(cache_dir, "capabilities.json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump({"version": CAPABILITY_CACHE_VERSION, "entries": entries}, cache_file)
+        os.replace(temp_path, os.path.join(cache_dir, "capabilities.json"))
+    except OSError as e:
+        logger.warning("Could not write capability cache: %s", e)
+
+def _cached_capability(binary, query, refresh=False):
+    key = _binary_key(binary)
+    if key is None:
+        return None
+    if not refresh and key in _capability_memo:
+        return _capability_memo[key]
+    entries = _load_capability_cache()
+    if refresh or key not in entries:
+        logger.info("Querying capabilities of %s", key.split("|")[0])
+        entries = {name: value for name, value in entries.items() if not name.startswith(key.split("|")[0] + "|")}
+        entries[key] = query(key.split("|")[0])
+        _save_capability_cache(entries)
+    _capability_memo[key] = entries[key]
+    return entries[key]
+
+def _run_capability_command(command):
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30, check=False)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("Capability query %s failed: %s", command[0], e)
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+def _query_ffmpeg(ffmpeg_path):
+    encoders, filters, hwaccels = [], [], []
+    output = _run_capability_command([ffmpeg_path, "-hide_banner", "-encoders"]) or ""
+    listing = False
+    for line in output.splitlines():
+        if line.strip().startswith("------"):
+            listing = True
+        elif listing and len(line.split()) >= 2:
+            encoders.append(line.split()[1])
+    output = _run_capability_command([ffmpeg_path, "-hide_banner", "-filters"]) or ""
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and "->" in parts[2]:
+            filters.append(parts[1])
+    output = _run_capability_command([ffmpeg_path, "-hide_banner", "-hwaccels"]) or ""
+    for line in output.splitlines():
+        if line.strip() and not line.strip().endswith(":"):
+            hwaccels.append(line.strip())
+    return {"encoders": encoders, "filters": filters, "hwaccels": hwaccels}
+
+def _query_nvidia_gpus(nvidia_smi_path):
+    output = _run_capability_command([
+        nvidia_smi_path, "--query-gpu=name,memory.total", "--format=csv,noheader,nounits"
+    ]) or ""
+    return {"gpus": [line.strip() for line in output.splitlines() if line.strip()]}
+
+def get_ffmpeg_capabilities(refresh=False):
+    return _cached_capability(get_ffmpeg_path(), _query_ffmpeg, refresh)
+
+def get_nvidia_gpus(refresh=False):
+    result = _cached_capability("nvidia-smi", _query_nvidia_gpus, refresh)
+    return result["gpus"] if result else []
+
+def has_ffmpeg_filter(name):
+    capabilities = get_ffmpeg_capabilities()
+    # Unknown capabilities (no ffmpeg on PATH yet) trust the user's settings
+    return not capabilities or not capabilities["filters"] or name in capabilities["filters"]
+
+def is_encoder_usable(name):
+    capabilities = get_ffmpeg_capabilities()
+    if not capabilities or not capabilities["encoders"]:
+        return True
+    if name not in capabilities["encoders"]:
+        return False
+    # NVENC may be compiled in on machines without an NVIDIA GPU
+    return "nvenc" not in name or bool(get_nvidia_gpus())
+
+def get_hwaccel_method(scene):
+    method = getattr(scene, 'hwaccel_method', 'NONE')
+    if not getattr(scene, 'use_hwaccel', False) or method == 'NONE':
+        return None
+    capabilities = get_ffmpeg_capabilities()
+    if capabilities and capabilities["hwaccels"]:
+        # NVDEC is the old name of FFmpeg's cuda hwaccel
+        if "cuda" not in capabilities["hwaccels"] or not get_nvidia_gpus():
+            logger.warning("CUDA decoding unavailable, decoding on the CPU")
+            return None
+    return "cuda"
+
+OUTPUT_EXTENSIONS = (".mp4", ".mov")
+
+def get_output_extension(scene):
+    # FFmpeg has no ProRes mapping for MP4, so ProRes goes into QuickTime
+    return ".mov" if get_video_encoder(scene) == 'prores_ks' else ".mp4"
+
+def strip_output_extension(output_path):
+    root, extension = os.path.splitext(output_path)
+    return root if extension.lower() in OUTPUT_EXTENSIONS else output_path
+
+def resolve_output_path(scene):
+    output_path = strip_output_extension(bpy.path.abspath(getattr(scene, 'vsendless_output_path', scene.render.filepath)))
+    if is_draft_mode(scene):
+        # Drafts never overwrite the final render
+        output_path += "_draft"
+    return output_path + get_output_extension(scene)
+
+def get_timeline_frame_count(scene):
+    return max(scene.frame_end - scene.frame_start + 1, 1)
+
+def is_draft_mode(scene):
+    return getattr(scene, 'vsendless_draft_mode', False)
+
+def get_output_resolution(scene):
+    width, height = scene.render.resolution_x, scene.render.resolution_y
+    if not is_draft_mode(scene):
+        return width, height
+    percent = int(getattr(scene, 'vsendless_draft_scale', '50'))
+    # Encoders need even dimensions for 4:2:0
+    return max(width * percent // 200 * 2, 2), max(height * percent // 200 * 2, 2)
+
+def get_video_encoder(scene):
+    # The codec picked in the panel is the encoder; use_hwaccel only concerns
+    # decoding, and NVENC is used when an NVENC codec is picked
+    codec = getattr(scene, 'vsendless_ffmpeg_codec', 'libx264')
+    if is_encoder_usable(codec):
+        return codec
+    fallback = SOFTWARE_ENCODER_FALLBACKS.get(codec, "libx264")
+    if not is_encoder_usable(fallback):
+        fallback = "mpeg4"
+    logger.warning("Encoder %s is not available, falling back to %s", codec, fallback)
+    return fallback
+
+def get_gop_size(scene):
+    return max(getattr(scene, 'vsendless_gop_size', 60), 1)
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+STAT_MEMO_TTL = 60.0
+_stat_memo = {}
+
+def cached_file_signature(path):
+    # stat() results are reused for STAT_MEMO_TTL seconds, so extraction,
+    # validation and cache lookups in the same render (or the next one) don't
+    # each go back to possibly slow network storage for every strip
+    now = time.monotonic()
+    entry = _stat_memo.get(path)
+    if entry and entry[0] > now:
+        return entry[1]
+    signature = _file_signature(path)
+    _stat_memo[path] = (now + STAT_MEMO_TTL, signature)
+    return signature
+
+def cached_path_exists(path):
+    return bool(path) and cached_file_signature(path) is not None
+
+def find_proxy_files(seq, abs_path):
+    # Proxies built by Blender's "Set Selected Strip Proxies" live in
+    # BL_proxy/<file name>/proxy_<size>.avi next to the clip unless a custom
+    # proxy directory is set on the strip
+    proxy = getattr(seq, 'proxy', None)
+    if proxy is not None and getattr(proxy, 'use_proxy_custom_directory', False) and proxy.directory:
+        proxy_dir = os.path.join(bpy.path.abspath(proxy.directory), os.path.basename(abs_path))
+    else:
+        proxy_dir = os.path.join(os.path.dirname(abs_path), "BL_proxy", os.path.basename(abs_path))
+    proxies = {}
+    for percent in (25, 50, 75, 100):
+        path = os.path.join(proxy_dir, f"proxy_{percent}.avi")
+        if cached_path_exists(path):
+            proxies[percent] = path
+    return proxies
+
 def extract_timeline_data(scene):
     vse = scene.sequence_editor
     if not vse or not vse.sequences_all:
@@ -85,41 +324,178 @@ def extract_timeline_data(scene):
         return []
     timeline_data = []
     for seq in vse.sequences_all:
-        if hasattr(seq, "filepath") and seq.filepath:
+        if getattr(seq, 'mute', False):
+            continue
+        if seq.type == 'SOUND':
+            sound = getattr(seq, 'sound', None)
+            abs_path = bpy.path.abspath(sound.filepath) if sound and sound.filepath else ''
+            if not cached_path_exists(abs_path):
+                logger.warning(f"Sound file not found for {seq.name}: {abs_path}")
+                continue
+            timeline_data.append({
+                "name": seq.name,
+                "type": seq.type,
+                "filepath": abs_path,
+                "start_frame": seq.frame_final_start,
+                "end_frame": seq.frame_final_end,
+                "frame_offset_start": seq.frame_final_start - seq.frame_start,
+                "channel": seq.channel,
+                "volume": getattr(seq, 'volume', 1.0) * getattr(scene, 'audio_volume', 1.0),
+            })
+            logger.debug(f"Added sound: {seq.name}")
+        elif hasattr(seq, "filepath") and seq.filepath:
             abs_path = bpy.path.abspath(seq.filepath)
-            if os.path.exists(abs_path):
+            if cached_path_exists(abs_path):
                 timeline_data.append({
                     "name": seq.name,
                     "type": seq.type,
                     "filepath": abs_path,
-                    "start_frame": seq.frame_start,
+                    "start_frame": seq.frame_final_start,
                     "end_frame": seq.frame_final_end,
+                    "frame_offset_start": seq.frame_final_start - seq.frame_start,
                     "channel": seq.channel,
                     "blend_type": getattr(seq, 'blend_type', 'REPLACE'),
+                    "blend_alpha": getattr(seq, 'blend_alpha', 1.0),
                     "ffmpeg_filter": getattr(seq, 'ffmpeg_filter', ''),
+                    "proxies": find_proxy_files(seq, abs_path) if seq.type == 'MOVIE' else {},
                 })
                 logger.debug(f"Added sequence: {seq.name} ({seq.type})")
             else:
                 logger.warning(f"Sequence file not found: {abs_path}")
+        elif seq.type == 'IMAGE' and len(seq.elements):
+            directory = bpy.path.abspath(seq.directory)
+            image_sequence = detect_image_sequence(directory, [element.filename for element in seq.elements])
+            timeline_data.append({
+                "name": seq.name,
+                "type": seq.type,
+                "filepath": os.path.join(directory, seq.elements[0].filename),
+                "image_sequence": image_sequence,
+                "start_frame": seq.frame_final_start,
+                "end_frame": seq.frame_final_end,
+                "frame_offset_start": seq.frame_final_start - seq.frame_start,
+                "channel": seq.channel,
+                "blend_type": getattr(seq, 'blend_type', 'REPLACE'),
+                "blend_alpha": getattr(seq, 'blend_alpha', 1.0),
+                "ffmpeg_filter": getattr(seq, 'ffmpeg_filter', ''),
+            })
+            logger.debug(f"Added image sequence: {seq.name} ({len(seq.elements)} images)")
+        elif seq.type == 'SCENE' and seq.scene:
+            camera = getattr(seq, 'scene_camera', None) or seq.scene.camera
+            timeline_data.append({
+                "name": seq.name,
+                "type": seq.type,
+                "filepath": '',
+                "start_frame": seq.frame_final_start,
+                "end_frame": seq.frame_final_end,
+                "frame_offset_start": seq.frame_final_start - seq.frame_start,
+                "channel": seq.channel,
+                "blend_type": getattr(seq, 'blend_type', 'REPLACE'),
+                "blend_alpha": getattr(seq, 'blend_alpha', 1.0),
+                "ffmpeg_filter": getattr(seq, 'ffmpeg_filter', ''),
+                "scene": seq.scene.name,
+                "scene_input": getattr(seq, 'scene_input', 'CAMERA'),
+                "scene_frame_start": seq.scene.frame_start,
+                "camera": camera.name if camera else '',
+                "has_alpha": seq.scene.render.film_transparent,
+            })
+            logger.debug(f"Added scene strip: {seq.name} ({seq.scene.name})")
         elif seq.type in ['COLOR', 'TEXT', 'ADJUSTMENT']:
             timeline_data.append({
                 "name": seq.name,
                 "type": seq.type,
                 "filepath": '',
-                "start_frame": seq.frame_start,
+                "start_frame": seq.frame_final_start,
                 "end_frame": seq.frame_final_end,
                 "channel": seq.channel,
                 "blend_type": getattr(seq, 'blend_type', 'REPLACE'),
+                "blend_alpha": getattr(seq, 'blend_alpha', 1.0),
                 "ffmpeg_filter": getattr(seq, 'ffmpeg_filter', ''),
+                **get_generated_strip_settings(seq),
             })
             logger.debug(f"Added generated sequence: {seq.name} ({seq.type})")
     logger.info(f"Extracted {len(timeline_data)} sequences from timeline")
     return timeline_data
 
+def get_generated_strip_settings(seq):
+    # Everything needed to rebuild a generated strip as a lavfi source or, for
+    # adjustment layers, as a filter chain on the composite below it
+    if seq.type == 'COLOR':
+        return {"color": list(seq.color)[:3], "has_alpha": False}
+    if seq.type == 'TEXT':
+        font = getattr(seq, 'font', None)
+        font_file = ''
+        if font and font.filepath and font.filepath != '<builtin>':
+            font_file = bpy.path.abspath(font.filepath)
+        return {
+            "text": seq.text,
+            "font_size": seq.font_size,
+            "font_file": font_file,
+            "color": list(seq.color),
+            "location": list(seq.location),
+            # Blender 4.2 renamed align_x/align_y to anchor_x/anchor_y
+            "anchor_x": getattr(seq, 'anchor_x', getattr(seq, 'align_x', 'CENTER')),
+            "anchor_y": getattr(seq, 'anchor_y', getattr(seq, 'align_y', 'BOTTOM')),
+            "box_color": list(seq.box_color) if getattr(seq, 'use_box', False) else None,
+            "shadow_color": list(seq.shadow_color) if getattr(seq, 'use_shadow', False) else None,
+            "has_alpha": True,
+        }
+    brightness = contrast = 0.0
+    for modifier in getattr(seq, 'modifiers', []):
+        if modifier.type == 'BRIGHT_CONTRAST' and not getattr(modifier, 'mute', False):
+            brightness += modifier.bright
+            contrast += modifier.contrast
+    return {
+        "saturation": getattr(seq, 'color_saturation', 1.0),
+        "multiply": getattr(seq, 'color_multiply', 1.0),
+        "brightness": brightness,
+        "contrast": contrast,
+    }
+
+IMAGE_NUMBER_PATTERN = re.compile(r"^(.*?)(\d+)(\D*)$")
+
+def detect_image_sequence(directory, filenames):
+    # Turns a strip's element list into one image2 input: a printf pattern when
+    # the numbering is contiguous, otherwise an explicit ordered file list
+    files = [os.path.join(directory, filename) for filename in filenames]
+    if len(filenames) == 1:
+        return {"still": files[0]}
+    matches = [IMAGE_NUMBER_PATTERN.match(filename) for filename in filenames]
+    if all(matches):
+        prefix, _, suffix = matches[0].groups()
+        digits = [match.group(2) for match in matches]
+        if all(match.group(1) == prefix and match.group(3) == suffix for match in matches):
+            numbers = [int(number) for number in digits]
+            if numbers == list(range(numbers[0], numbers[0] + len(numbers))):
+                padded = len({len(number) for number in digits}) == 1 and digits[0].startswith("0")
+                number_format = f"%0{len(digits[0])}d" if padded else "%d"
+                pattern = os.path.join(directory.replace("%", "%%"), prefix.replace("%", "%%") + number_format + suffix.replace("%", "%%"))
+                return {"pattern": pattern, "start_number": numbers[0]}
+            missing = numbers[-1] - numbers[0] + 1 - len(set(numbers))
+            logger.warning("Image sequence %s has %d gaps in its numbering, using a file list",
+                           os.path.join(directory, prefix + "#" + suffix), missing)
+    return {"files": files}
+
+def _write_image_list(files, fps):
+    # ffconcat list for sequences that image2 cannot express; named by content
+    # so repeated renders reuse the same file
+    lines = ["ffconcat version 1.0"]
+    for path in files:
+        escaped = path.replace("'", "'\\''")
+        lines.append(f"file '{escaped}'")
+        lines.append(f"duration {1 / fps:.6f}")
+    content = "\n".join(lines) + "\n"
+    list_dir = os.path.join(tempfile.gettempdir(), "vsendless_lists")
+    os.makedirs(list_dir, exist_ok=True)
+    list_path = os.path.join(list_dir, hashlib.sha1(content.encode("utf-8")).hexdigest() + ".ffconcat")
+    if not os.path.exists(list_path):
+        with open(list_path, "w", encoding="utf-8") as list_file:
+            list_file.write(content)
+    return list_path
+
 def validate_sequences(timeline_data):
     valid_sequences = []
     for seq_data in timeline_data:
-        if seq_data.get("filepath") and not os.path.exists(seq_data["filepath"]):
+        if seq_data.get("filepath") and not cached_path_exists(seq_data["filepath"]):
             logger.error(f"Missing file: {seq_data['filepath']}")
             continue
         if seq_data.get("type") == "MOVIE" and not seq_data.get("filepath"):
@@ -129,76 +505,2766 @@ def validate_sequences(timeline_data):
     logger.info(f"Validated {len(valid_sequences)}/{len(timeline_data)} sequences")
     return valid_sequences
 
-def construct_ffmpeg_command(scene, timeline_data, output_path):
+# ==============================================================================
+# TIMELINE MODEL
+# ==============================================================================
+# The extracted strip list is kept per scene and reused until a depsgraph update
+# touches that scene or the media it references, so rendering an unchanged
+# timeline skips the sequencer walk. Strips are not IDs: any sequencer edit
+# arrives as an update of its scene, which is the granularity tracked here; an
+# update of a scene shown by a SCENE strip counts as an edit of that strip
+
+timeline_models = {}
+
+class TimelineModel:
+    def __init__(self):
+        self.strips = None
+
+    def invalidate(self):
+        self.strips = None
+
+    def shows_scene(self, scene_name):
+        return any(strip.get("scene") == scene_name for strip in self.strips or [])
+
+    def extract(self, scene):
+        if self.strips is None:
+            self.strips = extract_timeline_data(scene)
+        else:
+            logger.info("Timeline unchanged since last render; reusing %d extracted sequences", len(self.strips))
+        # Later stages annotate strips (probe, stabilization), so every render
+        # gets its own copies and the model stays as extracted
+        return [dict(strip) for strip in self.strips]
+
+def get_timeline_model(scene):
+    return timeline_models.setdefault(scene.name, TimelineModel())
+
+@bpy.app.handlers.persistent
+def vsendless_depsgraph_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Scene):
+            # Its camera, frame range or film settings are baked into SCENE strips
+            for name, model in timeline_models.items():
+                if name == update.id.name or model.shows_scene(update.id.name):
+                    model.invalidate()
+        elif isinstance(update.id, (bpy.types.Sound, bpy.types.Image, bpy.types.VectorFont)):
+            # Datablocks can be shared between scenes
+            for model in timeline_models.values():
+                model.invalidate()
+
+@bpy.app.handlers.persistent
+def vsendless_timeline_reset(*args):
+    # Undo/redo and file loads replace the data wholesale
+    timeline_models.clear()
+    _stat_memo.clear()
+
+def _timeline_handlers():
+    return [
+        (bpy.app.handlers.depsgraph_update_post, vsendless_depsgraph_update),
+        (bpy.app.handlers.undo_post, vsendless_timeline_reset),
+        (bpy.app.handlers.redo_post, vsendless_timeline_reset),
+        (bpy.app.handlers.load_post, vsendless_timeline_reset),
+    ]
+
+def register_timeline_handlers():
+    for handlers, handler in _timeline_handlers():
+        if handler not in handlers:
+            handlers.append(handler)
+
+def unregister_timeline_handlers():
+    # Matched by name so handlers left behind by an earlier run of the script go too
+    for handlers, handler in _timeline_handlers():
+        for registered in [item for item in handlers if getattr(item, "__name__", "") == handler.__name__]:
+            handlers.remove(registered)
+    timeline_models.clear()
+
+
+# ==============================================================================
+# MEDIA PROBING
+# ==============================================================================
+# ffprobe results are kept in a sidecar index next to the .blend, keyed by
+# path + mtime + size, so unchanged media is never probed twice
+
+PROBE_INDEX_VERSION = 3
+PROBE_WORKERS = 8
+PROBE_KEYFRAME_PACKETS = 300
+ALPHA_PIX_FMT_PATTERN = re.compile(r"^(yuva|rgba|bgra|argb|abgr|gbrap|ya\d|pal8)")
+
+def get_ffprobe_path():
+    ffprobe_path = shutil.which("ffprobe")
+    return ffprobe_path if ffprobe_path else "ffprobe"
+
+def get_probe_index_path():
+    if bpy.data.filepath:
+        return os.path.splitext(bpy.data.filepath)[0] + ".vsendless_probe.json"
+    return os.path.join(tempfile.gettempdir(), "vsendless_probe.json")
+
+def _parse_rate(rate):
+    numerator, _, denominator = (rate or "0/1").partition("/")
+    try:
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+def _probe_keyframe_interval(ffprobe_path, path):
+    # Only the first few hundred packets are read: enough to see the GOP structure
+    result = subprocess.run([
+        ffprobe_path, "-v", "error", "-select_streams", "v:0",
+        "-read_intervals", f"%+#{PROBE_KEYFRAME_PACKETS}",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60, check=False)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                keyframes.append(float(pts_time))
+            except ValueError:
+                continue
+    if len(keyframes) < 2:
+        return None
+    gaps = sorted(later - earlier for earlier, later in zip(keyframes, keyframes[1:]))
+    return gaps[len(gaps) // 2]
+
+def probe_media_file(path, ffprobe_path=None):
+    ffprobe_path = ffprobe_path or get_ffprobe_path()
+    result = subprocess.run([
+        ffprobe_path, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffprobe exited with {result.returncode}")
+    data = json.loads(result.stdout or "{}")
+    streams = data.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+    audio = [stream for stream in streams if stream.get("codec_type") == "audio"]
+    pix_fmt = video.get("pix_fmt", "")
+    info = {
+        "format": data.get("format", {}).get("format_name", ""),
+        "duration": float(data.get("format", {}).get("duration", 0) or 0),
+        # Non-zero for MPEG-TS and for MOV/MP4 with edit lists; -ss counts from here
+        "start_time": float(data.get("format", {}).get("start_time", 0) or 0),
+        "codec": video.get("codec_name", ""),
+        "profile": video.get("profile", ""),
+        "width": video.get("width", 0),
+        "height": video.get("height", 0),
+        "pix_fmt": pix_fmt,
+        "sample_aspect_ratio": video.get("sample_aspect_ratio", "1:1"),
+        "has_alpha": bool(ALPHA_PIX_FMT_PATTERN.match(pix_fmt)) if pix_fmt else None,
+        "fps": _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate")),
+        "audio_streams": len(audio),
+        "audio_codec": audio[0].get("codec_name", "") if audio else "",
+        "sample_rate": int(audio[0].get("sample_rate", 0) or 0) if audio else 0,
+        "keyframe_interval": None,
+    }
+    if video and data.get("format", {}).get("format_name", "") not in ("image2", "png_pipe", "exr_pipe"):
+        info["keyframe_interval"] = _probe_keyframe_interval(ffprobe_path, path)
+    return info
+
+class MediaProbeCache:
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._entries = self._load()
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != PROBE_INDEX_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def save(self):
+        if not self._dirty:
+            return
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as index_file:
+                json.dump({"version": PROBE_INDEX_VERSION, "entries": self._entries}, index_file)
+            os.replace(temp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Could not write probe index %s: %s", self.index_path, e)
+
+    @staticmethod
+    def _key(path):
+        signature = cached_file_signature(path)
+        return f"{path}|{signature[0]}|{signature[1]}" if signature else None
+
+    def probe_many(self, paths):
+        results = {}
+        pending = {}
+        for path in dict.fromkeys(paths):
+            key = self._key(path)
+            if key is None:
+                continue
+            if key in self._entries:
+                results[path] = self._entries[key]
+            else:
+                pending[path] = key
+        if pending:
+            ffprobe_path = shutil.which("ffprobe")
+            if not ffprobe_path:
+                logger.warning("ffprobe not found; skipping media probing for %d files", len(pending))
+                return results
+            logger.info("Probing %d media files", len(pending))
+            with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(pending))) as pool:
+                futures = {path: pool.submit(probe_media_file, path, ffprobe_path) for path in pending}
+            for path, future in futures.items():
+                try:
+                    info = future.result()
+                except Exception as e:
+                    logger.warning("Probe failed for %s: %s", path, e)
+                    continue
+                # Drop entries for older versions of the same file
+                for stale in [key for key in self._entries if key.startswith(f"{path}|")]:
+                    del self._entries[stale]
+                self._entries[pending[path]] = info
+                results[path] = info
+                self._dirty = True
+            self.save()
+        return results
+
+def probe_sequences(timeline_data):
+    paths = [strip["filepath"] for strip in timeline_data if strip.get("filepath")]
+    if not paths:
+        return timeline_data
+    probes = MediaProbeCache(get_probe_index_path()).probe_many(paths)
+    for strip in timeline_data:
+        info = probes.get(strip.get("filepath"))
+        if info:
+            strip["probe"] = info
+            strip["has_alpha"] = info.get("has_alpha")
+    return timeline_data
+
+# ==============================================================================
+# STABILIZATION ANALYSIS
+# ==============================================================================
+# vidstabdetect runs once per used region of each source clip, on a copy scaled
+# down to at most STABILIZE_DETECT_WIDTH, in parallel, and its transforms are
+# cached by source signature, region and detect settings; each render applies
+# vidstabtransform from a slice of that analysis, rescaled to output size, that
+# matches the decoded span
+
+STABILIZE_DETECT_VERSION = 3
+# FFmpeg 7 writes binary transforms by default; slicing needs the text format
+STABILIZE_DETECT_PARAMS = "shakiness=5:accuracy=9:stepsize=6:fileformat=ascii"
+STABILIZE_DETECT_WIDTH = 960
+STABILIZE_SMOOTHING = 30
+STABILIZE_WORKERS = 4
+LOCAL_MOTION_PATTERN = re.compile(r"\(LM (-?\d+) (-?\d+) (-?\d+) (-?\d+) (-?\d+) ")
+
+def get_stabilize_cache_dir(scene):
+    return os.path.join(get_cache_dir(scene), "stabilize")
+
+def get_stabilize_detect_size(scene):
+    # Output aspect ratio at no more than STABILIZE_DETECT_WIDTH, in even sizes
+    width, height = get_output_resolution(scene)
+    if width <= STABILIZE_DETECT_WIDTH:
+        return width, height
+    return STABILIZE_DETECT_WIDTH, max(2, round(height * STABILIZE_DETECT_WIDTH / width / 2) * 2)
+
+def plan_stabilize_ranges(scene, timeline_data):
+    # Source regions (in output frames) each clip is used over, padded by the
+    # smoothing window; regions closer than the shared-input gap are merged so
+    # any input build_input_table makes lies inside a single analysis
+    max_gap = round(SHARED_INPUT_MAX_GAP_SECONDS * scene.render.fps)
+    by_source = collections.defaultdict(list)
+    for strip in timeline_data:
+        if strip.get("type") != 'MOVIE' or not strip.get("filepath"):
+            continue
+        source_in = strip.get("frame_offset_start", 0)
+        by_source[strip["filepath"]].append((
+            max(source_in - STABILIZE_SMOOTHING, 0),
+            source_in + strip["end_frame"] - strip["start_frame"] + STABILIZE_SMOOTHING,
+            strip,
+        ))
+    ranges = []
+    for members in by_source.values():
+        members.sort(key=lambda member: member[0])
+        for range_start, range_end, strip in members:
+            if ranges and ranges[-1][2][0]["filepath"] == strip["filepath"] and range_start <= ranges[-1][1] + max_gap:
+                ranges[-1][1] = max(ranges[-1][1], range_end)
+                ranges[-1][2].append(strip)
+            else:
+                ranges.append([range_start, range_end, [strip]])
+    return ranges
+
+def _stabilize_detect_key(scene, filepath, range_start, range_end):
+    payload = json.dumps([
+        STABILIZE_DETECT_VERSION, filepath, cached_file_signature(filepath), range_start, range_end,
+        STABILIZE_DETECT_PARAMS, scene.render.fps, *get_stabilize_detect_size(scene),
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_stabilize_detect_command(scene, strip, range_start, range_end, result_path):
+    # Same frame rate and aspect ratio as the transform sees in
+    # _strip_filter_chain, so the motion vectors line up frame for frame and
+    # only need scaling up to output size
+    probe = strip.get("probe") or {}
+    fps = scene.render.fps
+    width, height = get_stabilize_detect_size(scene)
+    chain = []
+    if abs(probe.get("fps", 0) - fps) > 0.001:
+        chain.append(f"fps={fps}")
+    if (probe.get("width"), probe.get("height")) != (width, height):
+        chain.append(f"scale={width}:{height}:flags=fast_bilinear")
+    chain.append(f"vidstabdetect={STABILIZE_DETECT_PARAMS}:result='{result_path}'")
+    seek = ["-ss", f"{range_start / fps:.6f}"] if range_start > 0 else []
+    return [
+        get_ffmpeg_path(), "-hide_banner", "-nostats", *seek, "-t", f"{(range_end - range_start) / fps:.6f}",
+        "-i", strip["filepath"], "-an", "-vf", ",".join(chain), "-frames:v", str(range_end - range_start),
+        "-f", "null", os.devnull
+    ]
+
+def _run_stabilize_detect(command, temp_path, result_path):
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    if result.returncode != 0 or not os.path.exists(temp_path):
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "vidstabdetect failed")
+    os.replace(temp_path, result_path)
+
+def analyze_stabilization(scene, timeline_data):
+    if not getattr(scene, 'apply_stabilization', False) or is_draft_mode(scene):
+        return timeline_data
+    if not has_ffmpeg_filter("vidstabdetect") or not has_ffmpeg_filter("vidstabtransform"):
+        logger.warning("FFmpeg was built without libvidstab, skipping stabilization")
+        return timeline_data
+    cache_dir = get_stabilize_cache_dir(scene)
+    os.makedirs(cache_dir, exist_ok=True)
+    pending = {}
+    for range_start, range_end, strips in plan_stabilize_ranges(scene, timeline_data):
+        key = _stabilize_detect_key(scene, strips[0]["filepath"], range_start, range_end)
+        result_path = os.path.join(cache_dir, f"{key}.trf")
+        for strip in strips:
+            strip["stabilize_trf"] = result_path
+            strip["stabilize_start"] = range_start
+        if not os.path.exists(result_path) and result_path not in pending:
+            # Commands are built here: bpy data must not be touched from workers
+            temp_path = f"{result_path}.{os.getpid()}.tmp"
+            command = build_stabilize_detect_command(scene, strips[0], range_start, range_end, temp_path)
+            pending[result_path] = (strips[0]["filepath"], command, temp_path)
+    if pending:
+        print(f"[VSEndless] Analyzing motion for stabilization: {len(pending)} clip regions")
+        with ThreadPoolExecutor(max_workers=min(STABILIZE_WORKERS, len(pending))) as pool:
+            futures = {
+                pool.submit(_run_stabilize_detect, command, temp_path, result_path): (result_path, source)
+                for result_path, (source, command, temp_path) in pending.items()
+            }
+            for future, (result_path, source) in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning("Stabilization analysis failed for %s: %s", source, e)
+    readable = {}
+    for strip in timeline_data:
+        trf_path = strip.get("stabilize_trf")
+        if not trf_path:
+            continue
+        if trf_path not in readable:
+            readable[trf_path] = _is_text_transform_file(trf_path)
+            if not readable[trf_path] and os.path.exists(trf_path):
+                logger.warning("Stabilization analysis %s is not a text transform file, skipping it", trf_path)
+        if not readable[trf_path]:
+            del strip["stabilize_trf"]
+            del strip["stabilize_start"]
+    return timeline_data
+
+def _is_text_transform_file(trf_path):
+    try:
+        with open(trf_path, "r", encoding="utf-8") as trf_file:
+            return trf_file.readline().startswith("VID.STAB")
+    except (OSError, ValueError):
+        return False
+
+def _scale_local_motions(rest, scale_x, scale_y):
+    # (LM v.x v.y f.x f.y f.size contrast match): vectors and measurement
+    # fields move from detect size to output size, the scores stay as they are
+    def scale(match):
+        vx, vy, fx, fy, size = map(int, match.groups())
+        return (
+            f"(LM {round(vx * scale_x)} {round(vy * scale_y)} {round(fx * scale_x)} {round(fy * scale_y)} "
+            f"{round(size * scale_x)} "
+        )
+    return LOCAL_MOTION_PATTERN.sub(scale, rest)
+
+def get_stabilize_transforms(scene, strip, source_in, frame_count):
+    # vidstabtransform numbers frames from the first one it receives, so the
+    # region's analysis is cut down to the decoded span, renumbered from 1 and
+    # scaled from detect size up to output size
+    trf_path = strip["stabilize_trf"]
+    offset = source_in - strip.get("stabilize_start", 0)
+    width, height = get_output_resolution(scene)
+    detect_width, detect_height = get_stabilize_detect_size(scene)
+    scale_x, scale_y = width / detect_width, height / detect_height
+    slice_path = f"{os.path.splitext(trf_path)[0]}_{offset}_{frame_count}_{width}x{height}.trf"
+    if os.path.exists(slice_path):
+        return slice_path
+    header = []
+    frames = []
+    with open(trf_path, "r", encoding="utf-8") as trf_file:
+        for line in trf_file:
+            if not line.startswith("Frame "):
+                if not frames:
+                    header.append(line)
+                continue
+            number, _, rest = line[6:].partition(" ")
+            index = int(number) - 1
+            if offset <= index < offset + frame_count:
+                if (scale_x, scale_y) != (1, 1):
+                    rest = _scale_local_motions(rest, scale_x, scale_y)
+                frames.append(f"Frame {index - offset + 1} {rest}")
+    temp_path = f"{slice_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as slice_file:
+        slice_file.writelines(header + frames)
+    os.replace(temp_path, slice_path)
+    return slice_path
+
+# ==============================================================================
+# COLOR PIPELINE
+# ==============================================================================
+# .cube LUTs are parsed once into a compact float32 cache. A strip's custom
+# filter made only of simple color math (eq, colorchannelmixer, negate) is
+# folded into the scene LUT and baked as one .cube per distinct chain, so each
+# pixel costs a single lut3d lookup instead of a LUT followed by more filters
+
+LUT_CACHE_VERSION = 1
+# magic, version, LUT_3D_SIZE, DOMAIN_MIN xyz, DOMAIN_MAX xyz; float32 RGB triples follow
+LUT_HEADER = struct.Struct("<4sII6f")
+FOLDABLE_COLOR_OPTIONS = {
+    'eq': {'brightness', 'contrast', 'saturation', 'gamma'},
+    'colorchannelmixer': {'rr', 'rg', 'rb', 'gr', 'gg', 'gb', 'br', 'bg', 'bb'},
+    'negate': set(),
+}
+_lut_memo = {}
+_baked_lut_memo = {}
+
+def get_lut_cache_dir(scene):
+    return os.path.join(get_cache_dir(scene), "luts")
+
+def parse_cube_lut(path):
+    size = None
+    domain_min, domain_max = [0.0, 0.0, 0.0], [1.0, 1.0, 1.0]
+    values = array('f')
+    with open(path, "r", encoding="utf-8", errors="replace") as cube_file:
+        for line in cube_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line[0].isalpha():
+                keyword, _, rest = line.partition(" ")
+                keyword = keyword.upper()
+                if keyword == "LUT_3D_SIZE":
+                    size = int(rest)
+                elif keyword == "LUT_1D_SIZE":
+                    raise ValueError(f"{path} is a 1D LUT")
+                elif keyword == "DOMAIN_MIN":
+                    domain_min = [float(value) for value in rest.split()]
+                elif keyword == "DOMAIN_MAX":
+                    domain_max = [float(value) for value in rest.split()]
+                continue
+            values.extend(float(value) for value in line.split()[:3])
+    if not size or len(values) != size ** 3 * 3:
+        raise ValueError(f"{path}: expected {size}^3 RGB entries, found {len(values) // 3}")
+    return {"size": size, "domain_min": domain_min, "domain_max": domain_max, "values": values}
+
+def _lut_key(path):
+    signature = cached_file_signature(path)
+    if signature is None:
+        raise OSError(f"LUT not found: {path}")
+    return hashlib.sha1(json.dumps([LUT_CACHE_VERSION, path, signature]).encode("utf-8")).hexdigest()
+
+def _read_binary_lut(binary_path):
+    with open(binary_path, "rb") as binary_file:
+        magic, version, size, *domain = LUT_HEADER.unpack(binary_file.read(LUT_HEADER.size))
+        if magic != b"VSLT" or version != LUT_CACHE_VERSION:
+            raise ValueError(f"{binary_path} is not a LUT cache entry")
+        values = array('f')
+        values.fromfile(binary_file, size ** 3 * 3)
+    return {"size": size, "domain_min": domain[:3], "domain_max": domain[3:], "values": values}
+
+def load_lut(scene, path):
+    # Parsed .cube files are kept as raw float32 next to the other caches; a
+    # 65-point LUT loads from there in milliseconds instead of a text parse
+    key = _lut_key(path)
+    if key in _lut_memo:
+        return _lut_memo[key]
+    cache_dir = get_lut_cache_dir(scene)
+    binary_path = os.path.join(cache_dir, f"{key}.bin")
+    try:
+        lut = _read_binary_lut(binary_path)
+    except (OSError, ValueError, EOFError, struct.error):
+        lut = parse_cube_lut(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{binary_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as binary_file:
+            binary_file.write(LUT_HEADER.pack(b"VSLT", LUT_CACHE_VERSION, lut["size"], *lut["domain_min"], *lut["domain_max"]))
+            lut["values"].tofile(binary_file)
+        os.replace(temp_path, binary_path)
+    _lut_memo[key] = lut
+    return lut
+
+def parse_color_ops(filter_string):
+    # [(name, {option: value})] when every filter in the chain is simple,
+    # constant color math that can be folded into a LUT, otherwise None
+    ops = []
+    for part in filter_string.split(","):
+        name, _, args = part.strip().partition("=")
+        allowed = FOLDABLE_COLOR_OPTIONS.get(name)
+        if allowed is None:
+            return None
+        options = {}
+        for item in filter(None, args.split(":")):
+            key, sep, value = item.partition("=")
+            if not sep or key not in allowed:
+                return None
+            try:
+                options[key] = float(value)
+            except ValueError:
+                return None
+        ops.append((name, options))
+    return ops
+
+def _apply_color_ops(ops, red, green, blue):
+    for name, options in ops:
+        if name == 'negate':
+            red, green, blue = 1.0 - red, 1.0 - green, 1.0 - blue
+        elif name == 'colorchannelmixer':
+            red, green, blue = (
+                options.get('rr', 1.0) * red + options.get('rg', 0.0) * green + options.get('rb', 0.0) * blue,
+                options.get('gr', 0.0) * red + options.get('gg', 1.0) * green + options.get('gb', 0.0) * blue,
+                options.get('br', 0.0) * red + options.get('bg', 0.0) * green + options.get('bb', 1.0) * blue,
+            )
+        else:
+            # eq's luma/chroma math, done on BT.601 YCbCr like the YUV frames it normally sees
+            luma = 0.299 * red + 0.587 * green + 0.114 * blue
+            cb = (blue - luma) / 1.772 * options.get('saturation', 1.0)
+            cr = (red - luma) / 1.402 * options.get('saturation', 1.0)
+            luma = options.get('contrast', 1.0) * (luma - 0.5) + 0.5 + options.get('brightness', 0.0)
+            luma = luma ** (1.0 / options.get('gamma', 1.0)) if luma > 0.0 else 0.0
+            red = luma + 1.402 * cr
+            blue = luma + 1.772 * cb
+            green = (luma - 0.299 * red - 0.114 * blue) / 0.587
+        red, green, blue = (min(max(channel, 0.0), 1.0) for channel in (red, green, blue))
+    return red, green, blue
+
+def bake_color_chain(scene, lut_path, ops):
+    key = hashlib.sha1(json.dumps([_lut_key(lut_path), ops]).encode("utf-8")).hexdigest()
+    if key in _baked_lut_memo:
+        return _baked_lut_memo[key]
+    cube_path = os.path.join(get_lut_cache_dir(scene), f"{key}.cube")
+    if not os.path.exists(cube_path):
+        lut = load_lut(scene, lut_path)
+        values = lut["values"]
+        lines = [
+            "# Baked by VSEndless\n",
+            f"LUT_3D_SIZE {lut['size']}\n",
+            "DOMAIN_MIN {:g} {:g} {:g}\n".format(*lut["domain_min"]),
+            "DOMAIN_MAX {:g} {:g} {:g}\n".format(*lut["domain_max"]),
+        ]
+        for index in range(0, len(values), 3):
+            lines.append("{:.6f} {:.6f} {:.6f}\n".format(*_apply_color_ops(ops, *values[index:index + 3])))
+        temp_path = f"{cube_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as cube_file:
+            cube_file.writelines(lines)
+        os.replace(temp_path, cube_path)
+    _baked_lut_memo[key] = cube_path
+    return cube_path
+
+def apply_color_pipeline(scene, strip):
+    # Splits the strip's color work into "color_filter" (one lut3d) and
+    # whatever custom filter is left over
+    if not (getattr(scene, 'apply_lut', False) and getattr(scene, 'lut_file_path', None)):
+        return strip
+    lut_path = bpy.path.abspath(scene.lut_file_path)
+    ops = parse_color_ops(strip["ffmpeg_filter"]) if strip.get("ffmpeg_filter") else None
+    if ops:
+        try:
+            baked_path = bake_color_chain(scene, lut_path, ops)
+            return {**strip, "color_filter": f"lut3d=file='{baked_path}'", "ffmpeg_filter": ""}
+        except (OSError, ValueError) as e:
+            logger.warning("Could not bake %s into %s: %s", strip["ffmpeg_filter"], lut_path, e)
+    return {**strip, "color_filter": f"lut3d=file='{lut_path}'"}
+
+# Blender blend_type -> FFmpeg blend all_mode. ALPHA_OVER/REPLACE/CROSS use overlay
+# and anything without an FFmpeg equivalent falls back to it as well
+BLEND_MODES = {
+    'ADD': 'addition', 'SUBTRACT': 'subtract', 'MULTIPLY': 'multiply', 'SCREEN': 'screen',
+    'OVERLAY': 'overlay', 'DARKEN': 'darken', 'LIGHTEN': 'lighten', 'DIFFERENCE': 'difference',
+    'EXCLUSION': 'exclusion', 'BURN': 'burn', 'DODGE': 'dodge', 'SOFT_LIGHT': 'softlight',
+    'HARD_LIGHT': 'hardlight', 'VIVID_LIGHT': 'vividlight', 'LINEAR_LIGHT': 'linearlight',
+    'PIN_LIGHT': 'pinlight', 'DIVIDE': 'divide',
+}
+
+GENERATED_STRIP_TYPES = ('COLOR', 'TEXT', 'ADJUSTMENT')
+
+def _strip_is_opaque(strip):
+    if strip.get("type") == 'ADJUSTMENT' or strip.get("blend_alpha", 1.0) < 1.0:
+        return False
+    if strip.get("blend_type") == 'REPLACE':
+        return True
+    return strip.get("blend_type") == 'ALPHA_OVER' and strip.get("has_alpha") is False
+
+def _strip_covers_black(strip):
+    # A bottom layer that replaces black outright; anything else (opacity,
+    # blend modes, an alpha channel) is composited over black like the VSE does
+    return (
+        strip.get("blend_alpha", 1.0) >= 1.0 and strip.get("blend_type") in ('REPLACE', 'ALPHA_OVER')
+        and strip.get("has_alpha") is not True
+    )
+
+def get_visual_strips(timeline_data):
+    return [
+        strip for strip in timeline_data
+        if strip.get("type") in GENERATED_STRIP_TYPES
+        or strip.get("filepath") and (strip.get("type") == 'MOVIE' or strip.get("image_sequence"))
+    ]
+
+def compile_timeline_intervals(strips, range_start, range_end):
+    cuts = {range_start, range_end}
+    for strip in strips:
+        for frame in (strip["start_frame"], strip["end_frame"]):
+            if range_start < frame < range_end:
+                cuts.add(frame)
+    cuts = sorted(cuts)
+    intervals = []
+    for start, end in zip(cuts, cuts[1:]):
+        active = sorted(
+            (strip for strip in strips if strip["start_frame"] <= start and strip["end_frame"] >= end),
+            key=lambda strip: strip.get("channel", 0),
+        )
+        # Walk down from the top channel; nothing below an opaque layer is visible
+        layers = []
+        for strip in reversed(active):
+            layers.insert(0, strip)
+            if _strip_is_opaque(strip):
+                break
+        if intervals and [id(layer) for layer in intervals[-1][2]] == [id(layer) for layer in layers]:
+            intervals[-1] = (intervals[-1][0], end, layers)
+        else:
+            intervals.append((start, end, layers))
+    return intervals
+
+def _append_gap_source(filter_complex, resolution, fps, frame_count):
+    # Empty stretches of the timeline render as black, like the VSE preview
+    label = f"[gap{len(filter_complex)}]"
+    filter_complex.append(f"color=c=black:s={resolution}:r={fps},trim=end_frame={frame_count}{label}")
+    return label
+
+def _append_blend(filter_complex, base, layer, label, strip):
+    opacity = strip.get("blend_alpha", 1.0)
+    mode = BLEND_MODES.get(strip.get("blend_type"))
+    if mode:
+        # Blend in RGB so the modes behave like the VSE rather than acting on YUV planes
+        filter_complex.append(f"{base}format=gbrp[{label}a];{layer}format=gbrp[{label}b]")
+        filter_complex.append(f"[{label}a][{label}b]blend=all_mode={mode}:all_opacity={opacity}[{label}]")
+        return f"[{label}]"
+    if opacity < 1.0:
+        filter_complex.append(f"{layer}format=rgba,colorchannelmixer=aa={opacity}[{label}b]")
+        layer = f"[{label}b]"
+    filter_complex.append(f"{base}{layer}overlay=format=auto[{label}]")
+    return f"[{label}]"
+
+def _ffmpeg_color(color):
+    hex_color = "0x" + "".join(f"{round(min(max(channel, 0.0), 1.0) * 255):02X}" for channel in color[:3])
+    return f"{hex_color}@{color[3]:g}" if len(color) > 3 else hex_color
+
+def _escape_filter_value(value):
+    # Escaped once for the filter's option parser and once more for the
+    # filtergraph parser, so text and paths can hold any character
+    value = re.sub(r"([\\':])", r"\\\1", value)
+    return re.sub(r"([\\'\[\],;])", r"\\\1", value)
+
+def _drawtext_filter(scene, strip):
+    # Blender places the text's anchor point at a normalized location measured
+    # from the bottom left; font size is in pixels at the full render size
+    width, height = get_output_resolution(scene)
+    scale = width / scene.render.resolution_x
+    x, y = strip.get("location", (0.5, 0.5))
+    anchor_x = {'LEFT': "", 'RIGHT': "-text_w"}.get(strip.get("anchor_x"), "-text_w/2")
+    anchor_y = {'TOP': "", 'CENTER': "-text_h/2"}.get(strip.get("anchor_y"), "-text_h")
+    options = [
+        "expansion=none",
+        f"text={_escape_filter_value(strip.get('text', ''))}",
+        f"fontsize={max(1, round(strip.get('font_size', 60) * scale))}",
+        f"fontcolor={_ffmpeg_color(strip.get('color', (1.0, 1.0, 1.0, 1.0)))}",
+        f"x=W*{x:g}{anchor_x}",
+        f"y=H*{1.0 - y:g}{anchor_y}",
+    ]
+    if strip.get("font_file"):
+        options.append(f"fontfile={_escape_filter_value(strip['font_file'])}")
+    if strip.get("box_color"):
+        options.extend(["box=1", f"boxcolor={_ffmpeg_color(strip['box_color'])}", f"boxborderw={max(1, round(10 * scale))}"])
+    if strip.get("shadow_color"):
+        offset = max(1, round(3 * scale))
+        options.extend([f"shadowcolor={_ffmpeg_color(strip['shadow_color'])}", f"shadowx={offset}", f"shadowy={offset}"])
+    return "drawtext=" + ":".join(options)
+
+def _generated_source(scene, strip, frame_count):
+    # COLOR and TEXT strips come straight from lavfi sources inside the graph:
+    # nothing to demux or decode, and no intermediate files
+    resolution = "x".join(map(str, get_output_resolution(scene)))
+    fps = scene.render.fps
+    if strip["type"] == 'COLOR':
+        chain = [f"color=c={_ffmpeg_color(strip.get('color', (0.0, 0.0, 0.0)))}:s={resolution}:r={fps}"]
+    else:
+        chain = [f"color=c=black@0.0:s={resolution}:r={fps}", "format=rgba", _drawtext_filter(scene, strip)]
+    chain.append(f"trim=end_frame={frame_count}")
+    if strip.get("ffmpeg_filter"):
+        chain.append(strip["ffmpeg_filter"])
+    return ",".join(chain)
+
+def _adjustment_filter_chain(strip):
+    chain = []
+    saturation = strip.get("saturation", 1.0)
+    if strip.get("brightness") or strip.get("contrast") or saturation != 1.0:
+        # Blender's Brightness/Contrast modifier works in -100..100
+        chain.append(
+            f"eq=brightness={strip.get('brightness', 0.0) / 100:g}"
+            f":contrast={1.0 + strip.get('contrast', 0.0) / 100:g}:saturation={saturation:g}"
+        )
+    multiply = strip.get("multiply", 1.0)
+    if multiply != 1.0:
+        chain.append(f"colorchannelmixer=rr={multiply:g}:gg={multiply:g}:bb={multiply:g}")
+    if strip.get("ffmpeg_filter"):
+        chain.append(strip["ffmpeg_filter"])
+    return ",".join(chain)
+
+def _append_adjustment(filter_complex, base, label, strip):
+    # Adjustment layers filter everything composited below them; opacity mixes
+    # the adjusted result back over the untouched composite
+    chain = _adjustment_filter_chain(strip)
+    if not chain:
+        return base
+    opacity = strip.get("blend_alpha", 1.0)
+    if opacity >= 1.0:
+        filter_complex.append(f"{base}{chain}[{label}]")
+        return f"[{label}]"
+    filter_complex.append(f"{base}split[{label}o][{label}i];[{label}i]{chain}[{label}f]")
+    return _append_blend(filter_complex, f"[{label}o]", f"[{label}f]", label, {**strip, "blend_type": 'ALPHA_OVER'})
+
+def _strip_input_args(strip, source_in, frame_count, fps, hw_accel_in):
+    duration = ["-t", f"{frame_count / fps:.6f}"]
+    image_sequence = strip.get("image_sequence")
+    if not image_sequence:
+        # Input-side -ss seeks to the keyframe before the in-point and only decodes
+        # the remainder of that GOP, so trimmed-out footage is never decoded
+        seek = ["-ss", f"{source_in / fps:.6f}"] if source_in > 0 else []
+        return [*hw_accel_in, *seek, *duration, "-i", strip["filepath"]]
+    if "still" in image_sequence:
+        return ["-loop", "1", "-framerate", str(fps), *duration, "-i", image_sequence["still"]]
+    if "pattern" in image_sequence:
+        # Trimming an image sequence is just a later start number: no seeking at all
+        return [
+            "-f", "image2", "-framerate", str(fps),
+            "-start_number", str(image_sequence["start_number"] + source_in),
+            *duration, "-i", image_sequence["pattern"],
+        ]
+    files = image_sequence["files"][source_in:source_in + frame_count]
+    return ["-f", "concat", "-safe", "0", *duration, "-i", _write_image_list(files, fps)]
+
+def _scale_filter(scene, probe):
+    width, height = get_output_resolution(scene)
+    if (probe.get("width"), probe.get("height")) == (width, height):
+        return None
+    if probe.get("width", 0) >= width and probe.get("height", 0) >= height:
+        # Downscaling averages detail away anyway, so the cheapest kernel is enough
+        return f"scale={width}:{height}:flags=fast_bilinear"
+    return f"scale={width}:{height}"
+
+def _strip_filter_chain(scene, strip, frame_count, gpu_frames=False, source_in=0):
+    # Filters that would be identities for this input (same rate, size and square
+    # pixels as the output) are left out so matching sources go straight through
+    fps = scene.render.fps
+    probe = strip.get("probe") or {}
+    chain = []
+    if not strip.get("image_sequence") and abs(probe.get("fps", 0) - fps) > 0.001:
+        chain.append(f"fps={fps}")
+    chain.extend([f"trim=end_frame={frame_count}", "setpts=PTS-STARTPTS"])
+    denoise = getattr(scene, 'enable_denoising', False)
+    strength = getattr(scene, 'denoise_strength', 3.0)
+    draft = is_draft_mode(scene)
+    if gpu_frames:
+        # Decoded frames stay on the GPU for scaling (and denoising when the
+        # build has it) and only the smaller result is downloaded
+        width, height = get_output_resolution(scene)
+        chain.append(f"scale_cuda={width}:{height}")
+        if denoise and not draft and getattr(scene, 'use_gpu_denoising', False) and has_ffmpeg_filter("tnr_cuda"):
+            chain.append(f"tnr_cuda=mode=spatial:strength={strength}")
+            denoise = False
+        ten_bit = "10" in probe.get("pix_fmt", "") or "12" in probe.get("pix_fmt", "")
+        chain.extend(["hwdownload", "format=p010le" if ten_bit else "format=nv12"])
+    else:
+        scale_filter = _scale_filter(scene, probe)
+        if scale_filter:
+            chain.append(scale_filter)
+    if denoise and draft:
+        # hqdn3d is a fraction of nlmeans' cost and close enough to judge a cut
+        chain.append(f"hqdn3d={strength:g}")
+    elif denoise:
+        chain.append(f"nlmeans=s={strength}")
+    if getattr(scene, 'apply_stabilization', False) and not draft and strip.get("stabilize_trf"):
+        try:
+            transforms = get_stabilize_transforms(scene, strip, source_in, frame_count)
+        except (OSError, ValueError) as e:
+            # One unreadable analysis only costs this strip its stabilization
+            logger.warning("Skipping stabilization for %s: %s", strip.get("name", strip["filepath"]), e)
+            transforms = None
+        if transforms:
+            chain.append(f"vidstabtransform=input='{transforms}':smoothing={STABILIZE_SMOOTHING}")
+    if strip.get("color_filter"):
+        chain.append(strip["color_filter"])
+    if strip.get("ffmpeg_filter"):
+        chain.append(strip["ffmpeg_filter"])
+    if probe.get("sample_aspect_ratio") not in ("1:1", "0:1"):
+        chain.append("setsar=1")
+    return chain
+
+def use_draft_proxy(scene, strip):
+    # The smallest Blender proxy that still covers the draft resolution; proxies
+    # keep the source frame rate, so only the file and frame size change
+    probe = strip.get("probe") or {}
+    width, height = get_output_resolution(scene)
+    sizes = sorted(
+        size for size in strip.get("proxies", {})
+        if probe.get("width", 0) * size // 100 >= width and probe.get("height", 0) * size // 100 >= height
+    )
+    if not sizes:
+        return strip
+    probe = {**probe, "width": probe["width"] * sizes[0] // 100, "height": probe["height"] * sizes[0] // 100}
+    return {**strip, "filepath": strip["proxies"][sizes[0]], "probe": probe, "proxy": True}
+
+SHARED_INPUT_MAX_GAP_SECONDS = 2.0
+
+def build_input_table(spans, fps):
+    # One FFmpeg input per region of a source file. Strips share a demuxer and
+    # decoder when their source ranges overlap or lie within a couple of seconds
+    # of each other, and when they also play in step (same timeline-to-source
+    # offset give or take that gap), so split never has to hold more than a few
+    # seconds of decoded frames for a branch that is consumed later
+    max_gap = round(SHARED_INPUT_MAX_GAP_SECONDS * fps)
+    by_source = {}
+    for strip, start, end, _ in spans.values():
+        source_in = strip.get("frame_offset_start", 0) + start - strip["start_frame"]
+        by_source.setdefault(strip["filepath"], []).append((source_in, source_in + end - start, start - source_in, strip))
+    table = []
+    for members in by_source.values():
+        open_entries = []
+        for source_in, source_out, drift, strip in sorted(members, key=lambda member: member[0]):
+            entry = next((
+                entry for entry in open_entries
+                if source_in <= entry["source_out"] + max_gap and abs(drift - entry["drift"]) <= max_gap
+            ), None)
+            if entry is None:
+                entry = {"strip": strip, "source_in": source_in, "source_out": source_out, "drift": drift, "members": []}
+                open_entries.append(entry)
+                table.append(entry)
+            entry["source_out"] = max(entry["source_out"], source_out)
+            entry["members"].append((strip, source_in - entry["source_in"]))
+    return table
+
+def _append_split(filter_complex, source, label, count):
+    if count == 1:
+        filter_complex.append(f"{source}[{label}]")
+        return [f"[{label}]"]
+    outputs = [f"[{label}_{index}]" for index in range(count)]
+    filter_complex.append(f"{source},split={count}{''.join(outputs)}")
+    return outputs
+
+def construct_ffmpeg_command(scene, timeline_data, output_path, frame_range=None, encoder_args=None, piped_strip=None,
+                             threads=None):
     ffmpeg_path = get_ffmpeg_path()
     inputs = []
     filter_complex = []
-    resolution = f"{scene.render.resolution_x}x{scene.render.resolution_y}"
+    resolution = "x".join(map(str, get_output_resolution(scene)))
     fps = scene.render.fps
     hw_accel_in = []
-    if getattr(scene, 'use_hwaccel', False) and getattr(scene, 'hwaccel_method', 'NONE') != 'NONE':
-        if scene.hwaccel_method == 'CUDA':
-            hw_accel_in = ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
-        elif scene.hwaccel_method == 'NVDEC':
-            hw_accel_in = ["-hwaccel", "nvdec", "-hwaccel_output_format", "cuda"]
-    for index, strip in enumerate(timeline_data):
-        if not strip.get("filepath"):
-            logger.warning("Timeline strip %d missing filepath.", index)
-            continue
-        inputs.extend([*hw_accel_in, "-i", strip["filepath"]])
+    hwaccel_method = get_hwaccel_method(scene)
+    if hwaccel_method:
+        hw_accel_in = ["-hwaccel", hwaccel_method]
+    gpu_scaling = bool(hw_accel_in) and getattr(scene, 'use_gpu_scaling', False) and has_ffmpeg_filter("scale_cuda")
+    range_start, range_end = frame_range or (scene.frame_start, scene.frame_end + 1)
+    visual_strips = get_visual_strips(timeline_data)
+    if piped_strip:
+        # Fed by PipedFFmpegProcess for every frame of the range
+        visual_strips.append(piped_strip)
+    if any(strip["type"] == 'TEXT' for strip in visual_strips) and not has_ffmpeg_filter("drawtext"):
+        logger.warning("FFmpeg was built without drawtext (libfreetype), skipping TEXT strips")
+        visual_strips = [strip for strip in visual_strips if strip["type"] != 'TEXT']
+    if not visual_strips:
+        logger.error("No video inputs for FFmpeg filter complex.")
+        return []
+    if is_draft_mode(scene) and getattr(scene, 'vsendless_draft_use_proxies', True):
+        visual_strips = [use_draft_proxy(scene, strip) for strip in visual_strips]
+    visual_strips = [apply_color_pipeline(scene, strip) if strip.get("filepath") else strip for strip in visual_strips]
+    intervals = compile_timeline_intervals(visual_strips, range_start, range_end)
+    decoder_args = []
+    if threads:
+        # Decoders running at the same time share the process' threads instead
+        # of each starting one thread (and frame buffer) per core
+        concurrent = max((sum(1 for strip in layers if strip.get("filepath")) for _, _, layers in intervals), default=1)
+        decoder_args = ["-threads", str(min(max(threads // max(concurrent, 1), 1), DECODER_MAX_THREADS))]
+    # Each strip is needed over the span where it is visible, with one branch
+    # per interval that shows it
+    spans = {}
+    for start, end, layers in intervals:
+        for strip in layers:
+            span = spans.setdefault(id(strip), [strip, start, end, 0])
+            span[2] = end
+            span[3] += 1
+    # Branches per strip: (label, offset of the strip's span in that stream, stream length)
+    branches = collections.defaultdict(collections.deque)
+    input_table = build_input_table({key: span for key, span in spans.items() if span[0].get("filepath")}, fps)
+    for key, (strip, span_start, span_end, uses) in spans.items():
+        if strip is piped_strip:
+            # The pipe is the last input and carries every frame of the range;
+            # Blender's read-back is bottom-up
+            chain = ",".join(filter(None, ["vflip", strip.get("ffmpeg_filter")]))
+            labels = _append_split(filter_complex, f"[{len(input_table)}:v]{chain}", "p", uses)
+            branches[key].extend((label, span_start - range_start, range_end - range_start) for label in labels)
+        elif strip["type"] in ('COLOR', 'TEXT'):
+            labels = _append_split(
+                filter_complex, _generated_source(scene, strip, span_end - span_start), f"g{len(branches)}", uses
+            )
+            branches[key].extend((label, 0, span_end - span_start) for label in labels)
+    for input_index, entry in enumerate(input_table):
+        strip = entry["strip"]
+        frame_count = entry["source_out"] - entry["source_in"]
+        gpu_frames = (
+            gpu_scaling and not strip.get("image_sequence") and not strip.get("proxy")
+            and _scale_filter(scene, strip.get("probe") or {}) is not None
+        )
+        strip_hw_accel = [*hw_accel_in, "-hwaccel_output_format", "cuda"] if gpu_frames else hw_accel_in
+        inputs.extend([*decoder_args, *_strip_input_args(strip, entry["source_in"], frame_count, fps, strip_hw_accel)])
+        # Per-strip custom filters run after the split so the decoded input stays
+        # shareable; the LUT stays before it unless members were baked differently
+        color_filters = {member.get("color_filter") for member, _ in entry["members"]}
+        shared_color = next(iter(color_filters)) if len(color_filters) == 1 else None
+        chain = ",".join(_strip_filter_chain(
+            scene, {**strip, "ffmpeg_filter": "", "color_filter": shared_color}, frame_count, gpu_frames, entry["source_in"]
+        ))
+        member_filters = {
+            id(member): ",".join(filter(None, [
+                member.get("color_filter") if shared_color is None else None,
+                member.get("ffmpeg_filter"),
+            ]))
+            for member, _ in entry["members"]
+        }
+        outputs = []
+        for member, offset in entry["members"]:
+            uses = 1 if member_filters[id(member)] else spans[id(member)][3]
+            outputs.extend([(member, offset)] * uses)
+        labels = _append_split(filter_complex, f"[{input_index}:v]{chain}", f"v{input_index}", len(outputs))
+        for output_index, ((member, offset), label) in enumerate(zip(outputs, labels)):
+            _, span_start, span_end, uses = spans[id(member)]
+            member_filter = member_filters[id(member)]
+            if not member_filter:
+                branches[id(member)].append((label, offset, frame_count))
+                continue
+            # Custom filters see the strip's whole span once, like before the split
+            filtered = _append_split(
+                filter_complex,
+                f"{label}trim=start_frame={offset}:end_frame={offset + span_end - span_start},"
+                f"setpts=PTS-STARTPTS,{member_filter}",
+                f"v{input_index}f{output_index}", uses,
+            )
+            branches[id(member)].extend((branch, 0, span_end - span_start) for branch in filtered)
+    if id(piped_strip) in spans:
+        inputs.extend(["-f", "rawvideo", "-pix_fmt", "rgba", "-s", resolution, "-framerate", str(fps), "-i", "pipe:0"])
     v_inputs = []
-    for index, strip in enumerate(timeline_data):
-        if strip.get("type") == 'MOVIE':
-            input_str = f"[{index}:v]"
-            scale_filter = f"scale={resolution}"
-            if getattr(scene, 'use_gpu_scaling', False):
-                scale_filter = f"scale_cuda={resolution}"
-            if getattr(scene, 'enable_denoising', False):
-                if getattr(scene, 'use_gpu_denoising', False):
-                    scale_filter += f",tnr_cuda=mode=spatial:strength={getattr(scene, 'denoise_strength', 3.0)}"
-                else:
-                    scale_filter += f",nlmeans=s={getattr(scene, 'denoise_strength', 3.0)}"
-            if getattr(scene, 'apply_stabilization', False):
-                scale_filter += ",vidstabtransform=smoothing=30"
-            if getattr(scene, 'apply_lut', False) and getattr(scene, 'lut_file_path', None):
-                scale_filter += f",lut3d=file='{scene.lut_file_path}'"
-            filter_complex.append(f"{input_str}{scale_filter}[v{index}]")
-            v_inputs.append(f"[v{index}]")
+    for interval_index, (start, end, layers) in enumerate(intervals):
+        if not layers:
+            v_inputs.append(_append_gap_source(filter_complex, resolution, fps, end - start))
+            continue
+        labels = []
+        for layer_index, strip in enumerate(layers):
+            if strip["type"] == 'ADJUSTMENT':
+                labels.append(None)
+                continue
+            branch, offset, length = branches[id(strip)].popleft()
+            trim_start = offset + start - spans[id(strip)][1]
+            if (trim_start, end - start) != (0, length):
+                trimmed = f"[i{interval_index}l{layer_index}]"
+                filter_complex.append(
+                    f"{branch}trim=start_frame={trim_start}:end_frame={trim_start + end - start},"
+                    f"setpts=PTS-STARTPTS{trimmed}"
+                )
+                branch = trimmed
+            labels.append(branch)
+        # A single covering layer goes straight through, no blend filters at all
+        composite = None
+        for layer_index, (strip, label) in enumerate(zip(layers, labels)):
+            if label is None:
+                if composite is not None:
+                    composite = _append_adjustment(filter_complex, composite, f"i{interval_index}a{layer_index}", strip)
+            elif composite is None and _strip_covers_black(strip):
+                composite = label
+            elif composite is None:
+                composite = _append_blend(
+                    filter_complex, _append_gap_source(filter_complex, resolution, fps, end - start), label,
+                    f"i{interval_index}c{layer_index}", strip,
+                )
+            else:
+                composite = _append_blend(filter_complex, composite, label, f"i{interval_index}c{layer_index}", strip)
+        if composite is None:
+            # Only adjustment layers here, with nothing under them to adjust
+            composite = _append_gap_source(filter_complex, resolution, fps, end - start)
+        v_inputs.append(composite)
     if len(v_inputs) > 1:
         filter_complex.append(f"{''.join(v_inputs)}concat=n={len(v_inputs)}:v=1:a=0[outv]")
         video_map = "[outv]"
-    elif v_inputs:
-        video_map = v_inputs[0]
-    else:
-        logger.error("No video inputs for FFmpeg filter complex.")
-        return []
-    codec_settings = []
-    codec = getattr(scene, 'ffmpeg_codec', 'libx264')
-    if 'nvenc' in codec or getattr(scene, 'use_hwaccel', False):
-        if codec == 'H264' or codec == 'libx264':
-            codec_settings = ["-c:v", "h264_nvenc"]
-        elif codec == 'H265' or codec == 'libx265':
-            codec_settings = ["-c:v", "hevc_nvenc"]
-        else:
-            codec_settings = ["-c:v", codec]
     else:
-        codec_settings = ["-c:v", codec]
-    bitrate = getattr(scene, 'ffmpeg_bitrate', 10)
-    codec_settings.extend(["-b:v", f"{bitrate}M"])
-    audio_settings = ["-c:a", "aac", "-b:a", "192k"]
+        video_map = v_inputs[0]
+    codec_settings = list(encoder_args) if encoder_args is not None else get_encoder_args(scene)
+    if frame_range:
+        # Segments are joined by the concat demuxer, which needs one time base
+        codec_settings.extend(["-video_track_timescale", str(SEGMENT_TIMESCALE)])
+    thread_args = []
+    if threads:
+        codec_settings.extend(["-threads", str(threads)])
+        thread_args = ["-filter_complex_threads", str(threads)]
     command = [
         ffmpeg_path,
+        *thread_args,
         *inputs,
         "-filter_complex", ";".join(filter_complex),
         "-map", video_map,
         *codec_settings,
         "-r", str(fps),
-        *audio_settings,
+        "-an",
         "-y", output_path
     ]
     logger.info("Constructed FFmpeg command: %s", ' '.join(map(str, command)))
     return command
 
+# ==============================================================================
+# ENCODER SETTINGS
+# ==============================================================================
+# Maps the panel's rate control, quality, preset and profile settings onto the
+# arguments each encoder actually understands
+
+TEN_BIT_PIX_FMTS = {'yuv420p': 'yuv420p10le', 'yuv422p': 'yuv422p10le', 'yuv444p': 'yuv444p10le'}
+X265_PROFILES = {
+    'yuv420p': 'main', 'yuv420p10le': 'main10', 'yuv444p': 'main444-8',
+    'yuv422p10le': 'main422-10', 'yuv444p10le': 'main444-10',
+}
+MULTIPASS_ENCODERS = ('libx264', 'libx265', 'mpeg4')
+# Lossless, intra-only and fast to decode: both passes read it back
+INTERMEDIATE_CODEC_ARGS = ["-c:v", "ffv1", "-level", "3", "-g", "1", "-slices", "16", "-slicecrc", "0"]
+
+def get_output_pix_fmt(scene, encoder):
+    pix_fmt = getattr(scene, 'vsendless_ffmpeg_pix_fmt', 'yuv420p')
+    if encoder == 'prores_ks':
+        # ProRes only exists as 10-bit 4:2:2 and 4:4:4
+        return 'yuv444p10le' if pix_fmt == 'yuv444p' else 'yuv422p10le'
+    if encoder == 'mpeg4':
+        return 'yuv420p'
+    hevc_main10 = CODEC_FAMILIES.get(encoder) == 'hevc' and getattr(scene, 'hevc_profile', 'main') == 'main10'
+    if 'nvenc' in encoder:
+        if hevc_main10:
+            return 'p010le'
+        if pix_fmt == 'yuv422p':
+            logger.warning("NVENC cannot encode 4:2:2, encoding yuv420p")
+            return 'yuv420p'
+        return pix_fmt
+    return TEN_BIT_PIX_FMTS[pix_fmt] if hevc_main10 else pix_fmt
+
+def _encoder_profile(scene, encoder, pix_fmt):
+    if encoder == 'libx264':
+        profile = getattr(scene, 'h264_profile', 'high')
+        if getattr(scene, 'rate_control_mode', 'VBR') in ('CQP', 'CRF') and getattr(scene, 'constant_quality_level', 23) == 0:
+            # Quantizer 0 is lossless, which only High 4:4:4 Predictive allows
+            return 'high444'
+        # Baseline/Main/High are 4:2:0 only
+        return {'yuv422p': 'high422', 'yuv444p': 'high444'}.get(pix_fmt, profile)
+    if encoder == 'h264_nvenc':
+        return 'high444p' if pix_fmt == 'yuv444p' else getattr(scene, 'h264_profile', 'high')
+    if encoder == 'libx265':
+        return X265_PROFILES.get(pix_fmt)
+    if encoder == 'hevc_nvenc':
+        if pix_fmt == 'yuv444p':
+            return 'rext'
+        return 'main10' if pix_fmt == 'p010le' else 'main'
+    if encoder == 'prores_ks':
+        # 3 = ProRes 422 HQ, 4 = ProRes 4444
+        return '4' if pix_fmt == 'yuv444p10le' else '3'
+    return None
+
+def _rate_control_args(scene, encoder):
+    mode = getattr(scene, 'rate_control_mode', 'VBR')
+    quality = getattr(scene, 'constant_quality_level', 23)
+    bitrate = getattr(scene, 'vsendless_ffmpeg_bitrate', 10)
+    peak = ["-maxrate", f"{bitrate * 1.5:g}M", "-bufsize", f"{bitrate * 2}M"]
+    if encoder == 'prores_ks':
+        # ProRes has fixed per-profile data rates
+        return []
+    if 'nvenc' in encoder:
+        if mode == 'CQP':
+            return ["-rc", "constqp", "-qp", str(quality)]
+        if mode == 'CRF':
+            # NVENC's constant-quality mode is VBR with a target CQ and no bitrate cap
+            return ["-rc", "vbr", "-cq", str(quality), "-b:v", "0"]
+        if mode == 'CBR':
+            return ["-rc", "cbr", "-b:v", f"{bitrate}M", "-bufsize", f"{bitrate * 2}M"]
+        return ["-rc", "vbr", "-b:v", f"{bitrate}M", *peak]
+    if mode in ('CQP', 'CRF'):
+        if encoder == 'mpeg4':
+            # MPEG-4 quantizers run 1-31 instead of 0-51
+            return ["-q:v", str(max(1, min(31, round(quality * 31 / 51))))]
+        return ["-qp" if mode == 'CQP' else "-crf", str(quality)]
+    if mode == 'CBR':
+        return ["-b:v", f"{bitrate}M", "-minrate", f"{bitrate}M", "-maxrate", f"{bitrate}M", "-bufsize", f"{bitrate * 2}M"]
+    return ["-b:v", f"{bitrate}M", *peak]
+
+def uses_software_multipass(scene, encoder):
+    # NVENC does its own in-encoder multipass; a separate pass only pays off for
+    # bitrate-targeted software encodes
+    return (
+        getattr(scene, 'use_multipass', False)
+        and not is_draft_mode(scene)
+        and encoder in MULTIPASS_ENCODERS
+        and getattr(scene, 'rate_control_mode', 'VBR') in ('CBR', 'VBR')
+    )
+
+def uses_expensive_filters(scene, timeline_data):
+    if getattr(scene, 'enable_denoising', False) or getattr(scene, 'apply_stabilization', False):
+        return True
+    return any(strip.get("ffmpeg_filter") for strip in timeline_data)
+
+def get_encoder_args(scene, encoder=None, pass_number=0, passlog=None):
+    encoder = encoder or get_video_encoder(scene)
+    pix_fmt = get_output_pix_fmt(scene, encoder)
+    args = ["-c:v", encoder]
+    draft = is_draft_mode(scene)
+    if 'nvenc' in encoder:
+        preset = 'p1' if draft else getattr(scene, 'nvenc_preset', 'p3')
+        args.extend(["-preset", preset, "-tune", getattr(scene, 'nvenc_tune', 'hq')])
+        if getattr(scene, 'use_multipass', False) and not draft:
+            # Both passes run inside the one encode; the quarter-resolution first
+            # pass is the fast one
+            args.extend(["-multipass", "qres"])
+    elif encoder == 'prores_ks':
+        args.extend(["-vendor", "apl0"])
+    elif draft and encoder in ('libx264', 'libx265'):
+        args.extend(["-preset", "ultrafast"])
+    args.extend(_rate_control_args(scene, encoder))
+    profile = _encoder_profile(scene, encoder, pix_fmt)
+    if draft and encoder == 'prores_ks':
+        # ProRes 422 Proxy
+        profile = '0'
+    if profile:
+        args.extend(["-profile:v", profile])
+    if pass_number and encoder == 'libx265':
+        # libx265 takes its pass settings through x265-params, where ':' separates options
+        stats = passlog.replace("\\", "/").replace(":", "\\:")
+        x265_params = f"pass={pass_number}:stats={stats}.log"
+        if pass_number == 1:
+            x265_params += ":slow-firstpass=0"
+        args.extend(["-x265-params", x265_params])
+    elif pass_number:
+        args.extend(["-pass", str(pass_number), "-passlogfile", passlog])
+        if pass_number == 1 and encoder == 'libx264':
+            # Analysis settings drop to their fastest values for the stats-only pass
+            args.extend(["-fastfirstpass", "1"])
+    args.extend(["-g", str(get_gop_size(scene))])
+    # Stated explicitly so FFmpeg only converts when the graph output differs
+    args.extend(["-pix_fmt", pix_fmt])
+    return args
+
+# ==============================================================================
+# STREAMING FFMPEG RUNNER
+# ==============================================================================
+# Runs FFmpeg without blocking on its output: `-progress pipe:1` key/value blocks
+# are parsed as they arrive and only the tail of stderr is kept for error reports
+
+FFMPEG_STDERR_TAIL_LINES = 200
+FFMPEG_POLL_INTERVAL = 0.1
+# "bench: utime=1.234s stime=0.120s rtime=0.800s" / "bench: maxrss=123456KiB"
+BENCH_PATTERN = re.compile(r"(\w+)=([\d.]+)(s|KiB)\b")
+
+class RenderJob:
+    # Shared interface of everything the engine and the render operator can drive:
+    # start(), poll(), cancel(), frame, total_frames, status_text(), error_report();
+    # encoders and threads are the FFmpeg encoders it runs at once and the CPU
+    # threads they share (0: FFmpeg's default of one per core), for schedulers
+    # running several jobs on one machine
+    total_frames = 0
+    cancelled = False
+    encoders = 1
+    threads = 0
+
+    @property
+    def fraction(self):
+        if self.total_frames <= 0:
+            return 0.0
+        return min(self.frame / self.total_frames, 1.0)
+
+    def wait(self, cancel_check=None, progress_callback=None, interval=FFMPEG_POLL_INTERVAL):
+        while self.poll() is None:
+            if cancel_check and cancel_check():
+                self.cancel()
+                break
+            if progress_callback:
+                progress_callback(self)
+            time.sleep(interval)
+        returncode = self.poll()
+        if progress_callback and not self.cancelled:
+            progress_callback(self)
+        return returncode
+
+    def ffmpeg_processes(self):
+        return []
+
+class FFmpegProcess(RenderJob):
+    def __init__(self, command, total_frames=0, stderr_tail_lines=FFMPEG_STDERR_TAIL_LINES, threads=0):
+        # -benchmark only adds a CPU time / peak memory summary at exit
+        self.command = [command[0], "-progress", "pipe:1", "-nostats", "-benchmark", *command[1:]]
+        self.total_frames = total_frames
+        self.threads = threads or 0
+        self.stderr_tail = collections.deque(maxlen=stderr_tail_lines)
+        self.progress = {}
+        self.cancelled = False
+        self._process = None
+        self._readers = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        logger.info("Starting FFmpeg: %s", ' '.join(map(str, self.command)))
+        self._process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        for target in (self._read_progress, self._read_stderr):
+            reader = threading.Thread(target=target, daemon=True)
+            reader.start()
+            self._readers.append(reader)
+        return self
+
+    def _read_progress(self):
+        block = {}
+        for line in self._process.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            block[key] = value
+            # Every progress block is terminated by a "progress=continue|end" line
+            if key == "progress":
+                with self._lock:
+                    self.progress = block
+                block = {}
+
+    def _read_stderr(self):
+        for line in self._process.stderr:
+            self.stderr_tail.append(line.rstrip())
+
+    @property
+    def frame(self):
+        with self._lock:
+            value = self.progress.get("frame", "0")
+        try:
+            return int(value)
+        except ValueError:
+            return 0
+
+    def status_text(self):
+        with self._lock:
+            fps = self.progress.get("fps", "0")
+            speed = self.progress.get("speed", "N/A").strip()
+        total = self.total_frames if self.total_frames > 0 else "?"
+        return f"Frame {self.frame}/{total} | {fps} fps | {speed}"
+
+    def poll(self):
+        returncode = self._process.poll()
+        if returncode is not None:
+            for reader in self._readers:
+                reader.join(timeout=1.0)
+        return returncode
+
+    def cancel(self):
+        if self._process is None or self._process.poll() is not None:
+            return
+        self.cancelled = True
+        logger.warning("Cancelling FFmpeg process %d", self._process.pid)
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+    def error_report(self):
+        return "\n".join(self.stderr_tail)
+
+    def ffmpeg_processes(self):
+        return [self]
+
+    def benchmark(self):
+        stats = {}
+        for line in self.stderr_tail:
+            if not line.startswith("bench:"):
+                continue
+            for key, value, unit in BENCH_PATTERN.findall(line):
+                stats[f"{key}_kib" if unit == "KiB" else f"{key}_s"] = float(value)
+        return stats
+
+# ==============================================================================
+# BLENDER FRAME PIPE
+# ==============================================================================
+# SCENE strips have no file FFmpeg could read. Where one is visible, Blender
+# draws its camera view off-screen on the main thread into a small pool of
+# preallocated RGBA buffers, and a writer thread streams them into that range's
+# FFmpeg process as `-f rawvideo -pix_fmt rgba` on stdin. Everything else in
+# the range is still composited by the FFmpeg filtergraph
+
+PIPE_BUFFER_COUNT = 4
+# Longest the main thread spends drawing frames per poll before handing back to the UI
+PIPE_PUMP_SLICE = 0.25
+
+def find_view3d():
+    # Off-screen drawing borrows shading settings from a 3D viewport
+    window_manager = getattr(bpy.context, 'window_manager', None)
+    for window in getattr(window_manager, 'windows', []):
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                region = next((region for region in area.regions if region.type == 'WINDOW'), None)
+                if region is not None:
+                    return area.spaces.active, region
+    return None, None
+
+def scene_strip_rendering_available():
+    # Drawing needs a GPU context, which only the main thread of an interactive
+    # session has: the operator's modal render, not F12 or background mode
+    return threading.current_thread() is threading.main_thread() and find_view3d()[0] is not None
+
+def get_pipeable_strips(timeline_data):
+    return [
+        strip for strip in timeline_data
+        if strip.get("type") == 'SCENE' and strip.get("camera") and strip.get("scene_input") == 'CAMERA'
+    ]
+
+def plan_piped_ranges(scene, timeline_data):
+    # Splits the scene range wherever the topmost visible SCENE strip changes:
+    # [(start, end, strip or None)], None meaning a pure FFmpeg range
+    scene_strips = get_pipeable_strips(timeline_data)
+    if not scene_strips:
+        return []
+    intervals = compile_timeline_intervals(
+        get_visual_strips(timeline_data) + scene_strips, scene.frame_start, scene.frame_end + 1
+    )
+    ranges = []
+    for start, end, layers in intervals:
+        scene_layers = [layer for layer in layers if layer.get("type") == 'SCENE']
+        piped = scene_layers[-1] if scene_layers else None
+        if len(scene_layers) > 1:
+            logger.warning("Frames %d-%d: only the topmost of %d stacked SCENE strips is drawn",
+                           start, end - 1, len(scene_layers))
+        if ranges and ranges[-1][2] is piped:
+            ranges[-1] = (ranges[-1][0], end, piped)
+        else:
+            ranges.append((start, end, piped))
+    return ranges
+
+class SceneStripFrameSource:
+    # OpenGL render of a SCENE strip's camera, the way the sequencer preview
+    # draws scene strips, read back bottom-up into caller-owned buffers
+    def __init__(self, strip, width, height):
+        import gpu
+        self.scene = bpy.data.scenes[strip["scene"]]
+        self.camera = bpy.data.objects[strip["camera"]]
+        self.view_layer = self.scene.view_layers[0]
+        self.view3d, self.region = find_view3d()
+        self.width = width
+        self.height = height
+        self.offscreen = gpu.types.GPUOffScreen(width, height)
+        self._original_frame = self.scene.frame_current
+
+    def new_buffer(self):
+        import gpu
+        return gpu.types.Buffer('UBYTE', self.width * self.height * 4)
+
+    def render(self, frame, buffer):
+        import gpu
+        self.scene.frame_set(frame)
+        projection = self.camera.calc_matrix_camera(self.view_layer.depsgraph, x=self.width, y=self.height)
+        self.offscreen.draw_view3d(
+            self.scene, self.view_layer, self.view3d, self.region,
+            self.camera.matrix_world.inverted(), projection, do_color_management=True,
+        )
+        with self.offscreen.bind():
+            framebuffer = gpu.state.active_framebuffer_get()
+            framebuffer.read_color(0, 0, self.width, self.height, 4, 0, 'UBYTE', data=buffer)
+
+    def close(self):
+        self.offscreen.free()
+        self.scene.frame_set(self._original_frame)
+
+class PipedFFmpegProcess(FFmpegProcess):
+    def __init__(self, command, strip, start, end, resolution):
+        super().__init__(command, total_frames=end - start)
+        self.strip = strip
+        self.resolution = resolution
+        self._next_frame = start
+        self._end = end
+        self._source = None
+        self._writer_released = False
+        # The buffer pool bounds both queues; frames only ever move between them
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        self._writer = None
+
+    def start(self):
+        logger.info("Starting FFmpeg (piped): %s", ' '.join(map(str, self.command)))
+        self._process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        for target in (self._read_progress, self._read_stderr):
+            reader = threading.Thread(target=target, daemon=True)
+            reader.start()
+            self._readers.append(reader)
+        self._writer = threading.Thread(target=self._write_frames, daemon=True)
+        self._writer.start()
+        return self
+
+    def _write_frames(self):
+        # Frames go to the binary stream under the text wrapper, straight from
+        # the buffer they were read into
+        stdin = self._process.stdin
+        while True:
+            buffer = self._filled.get()
+            if buffer is None:
+                break
+            try:
+                stdin.buffer.write(buffer)
+            except OSError as e:
+                self.stderr_tail.append(f"[pipe] {e}")
+                break
+            self._free.put(buffer)
+        with contextlib.suppress(OSError):
+            stdin.close()
+
+    def pump(self, time_slice=PIPE_PUMP_SLICE):
+        # Main thread only. Drawing stops when every buffer is waiting to be
+        # written, so FFmpeg's pace bounds both memory and how far Blender runs ahead
+        if self._process is None:
+            return
+        if self._next_frame >= self._end or self._process.poll() is not None:
+            self._release_source()
+            return
+        if self._source is None:
+            self._source = SceneStripFrameSource(self.strip, *self.resolution)
+            for _ in range(PIPE_BUFFER_COUNT):
+                self._free.put(self._source.new_buffer())
+        strip = self.strip
+        deadline = time.monotonic() + time_slice
+        while self._next_frame < self._end:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                buffer = self._free.get(timeout=remaining)
+            except queue.Empty:
+                return
+            scene_frame = (
+                strip["scene_frame_start"] + strip["frame_offset_start"] + self._next_frame - strip["start_frame"]
+            )
+            self._source.render(scene_frame, buffer)
+            self._filled.put(buffer)
+            self._next_frame += 1
+        self._filled.put(None)
+        self._release_source()
+
+    def _release_source(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    def poll(self):
+        returncode = super().poll()
+        if returncode is not None and not self._writer_released:
+            # FFmpeg may have stopped reading early; never leave the writer waiting
+            self._writer_released = True
+            self._filled.put(None)
+        return returncode
+
+# ==============================================================================
+# SEGMENT CACHE
+# ==============================================================================
+# Encoded segments are stored on disk keyed by a hash of everything that can
+# change their pixels, so re-renders only encode the segments that are dirty
+
+SEGMENT_CACHE_VERSION = 2
+
+# Scene settings that end up in construct_ffmpeg_command output
+ENCODE_SETTING_PROPERTIES = (
+    'vsendless_ffmpeg_codec', 'ffmpeg_codec', 'vsendless_ffmpeg_pix_fmt', 'vsendless_ffmpeg_bitrate',
+    'ffmpeg_bitrate', 'vsendless_gop_size', 'use_hwaccel', 'hwaccel_method', 'nvenc_preset', 'nvenc_tune',
+    'h264_profile', 'hevc_profile', 'rate_control_mode', 'constant_quality_level', 'use_multipass',
+    'use_gpu_scaling', 'use_gpu_denoising', 'denoise_strength', 'use_gpu_stabilization', 'enable_denoising',
+    'apply_stabilization', 'apply_lut', 'lut_file_path', 'vsendless_draft_mode', 'vsendless_draft_scale',
+    'vsendless_draft_use_proxies',
+)
+
+def get_encode_settings(scene):
+    settings = {name: getattr(scene, name, None) for name in ENCODE_SETTING_PROPERTIES}
+    settings["resolution"] = list(get_output_resolution(scene))
+    settings["fps"] = scene.render.fps
+    settings["encoder"] = get_video_encoder(scene)
+    settings["hwaccel"] = get_hwaccel_method(scene)
+    if settings.get("lut_file_path"):
+        settings["lut_file"] = _file_signature(bpy.path.abspath(settings["lut_file_path"]))
+    return settings
+
+def compute_segment_key(scene, timeline_data, start, end, encode_settings=None):
+    strips = []
+    for strip in timeline_data:
+        if strip.get("end_frame", end) <= start or strip.get("start_frame", start) >= end:
+            continue
+        # Audio is mixed separately, so sound edits keep video segments valid
+        if strip.get("type") == 'SOUND':
+            continue
+        entry = {key: value for key, value in strip.items() if key != "name"}
+        # Positions are stored relative to the segment so moving a whole section
+        # of the timeline does not invalidate its segments
+        for key in ("start_frame", "end_frame"):
+            if entry.get(key) is not None:
+                entry[key] -= start
+        if entry.get("filepath"):
+            entry["file"] = cached_file_signature(entry["filepath"])
+        if entry.get("font_file"):
+            entry["font"] = cached_file_signature(entry["font_file"])
+        if entry.get("image_sequence"):
+            entry["directory"] = cached_file_signature(os.path.dirname(entry["filepath"]))
+        strips.append(entry)
+    strips.sort(key=lambda entry: (entry.get("channel", 0), entry.get("start_frame", 0)))
+    payload = {
+        "version": SEGMENT_CACHE_VERSION,
+        "length": end - start,
+        "strips": strips,
+        "encode": encode_settings if encode_settings is not None else get_encode_settings(scene),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+def get_cache_dir(scene):
+    cache_dir = getattr(scene, 'vsendless_cache_dir', '')
+    if cache_dir:
+        return bpy.path.abspath(cache_dir)
+    return os.path.join(tempfile.gettempdir(), "vsendless_cache")
+
+class SegmentCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as index_file:
+            json.dump(self._index, index_file)
+        os.replace(temp_path, self.index_path)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._index.get(key)
+            path = self.path_for(key)
+            if entry is None or not os.path.exists(path):
+                self._index.pop(key, None)
+                return None
+            entry["last_used"] = time.time()
+            self._save_index()
+            return path
+
+    def store(self, key, source_path):
+        path = self.path_for(key)
+        shutil.copyfile(source_path, path)
+        with self._lock:
+            self._index[key] = {"size": os.path.getsize(path), "last_used": time.time()}
+            self._save_index()
+        return path
+
+    def evict(self, keep=()):
+        with self._lock:
+            total = sum(entry["size"] for entry in self._index.values())
+            # Least recently used first; segments of the current render are kept
+            for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.max_bytes:
+                    break
+                if key in keep:
+                    continue
+                try:
+                    os.remove(self.path_for(key))
+                except OSError:
+                    pass
+                total -= entry["size"]
+                del self._index[key]
+                logger.debug("Evicted cached segment %s", key)
+            self._save_index()
+
+def open_segment_cache(scene):
+    if not getattr(scene, 'vsendless_use_segment_cache', False):
+        return None
+    max_bytes = int(getattr(scene, 'vsendless_cache_size_gb', 20.0) * 1024 ** 3)
+    return SegmentCache(get_cache_dir(scene), max_bytes)
+
+# ==============================================================================
+# RESOURCE SCHEDULER
+# ==============================================================================
+# FFmpeg opens every input of a command up front, so one process for a long
+# timeline runs as many decoders as it has sources. Segments are split at
+# interval boundaries until each process fits the decoder and memory budget,
+# the number of processes running at once is capped by the same budget plus
+# NVENC sessions, and each process gets its share of the CPU threads
+
+# Rough frames held per stage: decoder frame threads and reorder queue, the
+# filtergraph's links, and the encoder's lookahead plus B-frames
+DECODER_FRAMES_IN_FLIGHT = 8
+# Every frame thread holds a frame of its own, so decoders get at most this many
+DECODER_MAX_THREADS = 4
+COMPOSITE_FRAMES_IN_FLIGHT = 4
+ENCODER_FRAMES_IN_FLIGHT = {'libx264': 60, 'libx265': 60, 'libsvtav1': 60}
+DEFAULT_ENCODER_FRAMES_IN_FLIGHT = 16
+DEFAULT_PHYSICAL_MEMORY = 8 * 1024 ** 3
+
+class ResourceBudget:
+    def __init__(self, decoders, encoder_sessions, memory_bytes, threads):
+        self.decoders = max(decoders, 1)
+        self.encoder_sessions = max(encoder_sessions, 1)
+        self.memory_bytes = memory_bytes
+        self.threads = max(threads, 1)
+
+    def share(self, count):
+        # One of count jobs running side by side on the same machine
+        count = max(count, 1)
+        return ResourceBudget(
+            self.decoders // count, self.encoder_sessions // count, self.memory_bytes // count, self.threads // count
+        )
+
+def get_physical_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus(dwLength=ctypes.sizeof(MemoryStatus))
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+    except (ImportError, AttributeError, OSError):
+        pass
+    return DEFAULT_PHYSICAL_MEMORY
+
+def get_resource_budget(scene):
+    memory_gb = getattr(scene, 'vsendless_memory_budget_gb', 0.0)
+    # Half the machine by default, leaving room for Blender itself
+    memory_bytes = int(memory_gb * 1024 ** 3) if memory_gb > 0 else get_physical_memory() // 2
+    return ResourceBudget(
+        decoders=getattr(scene, 'vsendless_max_decoders', 16),
+        encoder_sessions=NVENC_SESSIONS_PER_GPU * max(len(get_nvidia_gpus()), 1),
+        memory_bytes=memory_bytes,
+        threads=getattr(scene, 'vsendless_thread_budget', 0) or os.cpu_count() or 1,
+    )
+
+def _frame_bytes(width, height, pix_fmt):
+    if ALPHA_PIX_FMT_PATTERN.match(pix_fmt) or pix_fmt.startswith(("rgb", "bgr", "gbr")):
+        bytes_per_pixel = 4
+    elif "444" in pix_fmt:
+        bytes_per_pixel = 3
+    elif "422" in pix_fmt:
+        bytes_per_pixel = 2
+    else:
+        bytes_per_pixel = 1.5
+    if any(depth in pix_fmt for depth in ("10", "12", "16")):
+        bytes_per_pixel *= 2
+    return int(width * height * bytes_per_pixel)
+
+def _process_memory(scene, decoders, layers):
+    width, height = get_output_resolution(scene)
+    encoder = get_video_encoder(scene)
+    memory = ENCODER_FRAMES_IN_FLIGHT.get(encoder, DEFAULT_ENCODER_FRAMES_IN_FLIGHT) * _frame_bytes(
+        width, height, get_output_pix_fmt(scene, encoder)
+    )
+    # Blending runs in RGBA/GBRP at output size
+    memory += layers * COMPOSITE_FRAMES_IN_FLIGHT * _frame_bytes(width, height, "rgba")
+    for strip in decoders:
+        probe = strip.get("probe") or {}
+        memory += DECODER_FRAMES_IN_FLIGHT * _frame_bytes(
+            probe.get("width") or width, probe.get("height") or height, probe.get("pix_fmt") or "yuv420p"
+        )
+    return memory
+
+def schedule_segments(scene, timeline_data, segments, budget):
+    # -> (segments split to fit the budget, processes to run at once, threads per process)
+    visual_strips = get_visual_strips(timeline_data)
+    pieces = []
+    peak_decoders = 1
+    peak_memory = _process_memory(scene, [], 1)
+    for segment in segments:
+        start, end = segment[:2]
+        if len(segment) > 2 and segment[2]:
+            # Stream copies decode nothing
+            pieces.append(segment)
+            continue
+        piece_start = start
+        decoders = {}
+        layers_peak = 0
+        for interval_start, _, layers in compile_timeline_intervals(visual_strips, start, end):
+            interval_decoders = {id(strip): strip for strip in layers if strip.get("filepath")}
+            candidate = {**decoders, **interval_decoders}
+            candidate_layers = max(layers_peak, len(layers))
+            over_budget = (
+                len(candidate) > budget.decoders
+                or _process_memory(scene, candidate.values(), candidate_layers) > budget.memory_bytes
+            )
+            if over_budget and interval_start > piece_start:
+                pieces.append((piece_start, interval_start, *segment[2:]))
+                peak_decoders = max(peak_decoders, len(decoders))
+                peak_memory = max(peak_memory, _process_memory(scene, decoders.values(), layers_peak))
+                piece_start = interval_start
+                candidate = interval_decoders
+                candidate_layers = len(layers)
+            decoders = candidate
+            layers_peak = candidate_layers
+        pieces.append((piece_start, end, *segment[2:]))
+        peak_decoders = max(peak_decoders, len(decoders))
+        peak_memory = max(peak_memory, _process_memory(scene, decoders.values(), layers_peak))
+    if peak_decoders > budget.decoders or peak_memory > budget.memory_bytes:
+        logger.warning("Some frames need %d decoders / %.1f GB on their own, over the resource budget",
+                       peak_decoders, peak_memory / 1024 ** 3)
+    workers = min(
+        max(getattr(scene, 'vsendless_chunk_workers', 4), 1),
+        max(budget.decoders // peak_decoders, 1),
+        max(budget.memory_bytes // peak_memory, 1),
+        budget.threads,
+    )
+    if "nvenc" in get_video_encoder(scene):
+        workers = min(workers, budget.encoder_sessions)
+    threads = max(budget.threads // workers, 1)
+    logger.info("Scheduled %d segments, %d at a time with %d threads each (peak %d decoders, %.1f GB per process)",
+                len(pieces), workers, threads, peak_decoders, peak_memory / 1024 ** 3)
+    return pieces, workers, threads
+
+def create_segmented_render(scene, timeline_data, output_path, segments, budget, cache=None):
+    pieces, workers, threads = schedule_segments(scene, timeline_data, segments, budget)
+    return SegmentedRender(
+        scene, timeline_data, output_path, pieces,
+        workers=workers,
+        retries=getattr(scene, 'vsendless_chunk_retries', 2),
+        cache=cache,
+        threads=threads,
+    )
+
+# ==============================================================================
+# SEGMENT-PARALLEL RENDERING
+# ==============================================================================
+# Splits the scene range into GOP-aligned chunks, encodes them on a bounded pool
+# of FFmpeg workers and joins the results with the concat demuxer (-c copy)
+
+SEGMENT_TIMESCALE = 90000
+
+def plan_render_segments(scene, timeline_data):
+    range_start = scene.frame_start
+    range_end = scene.frame_end + 1
+    gop = get_gop_size(scene)
+    chunk_length = max(getattr(scene, 'vsendless_chunk_length', 600), 1)
+    # Chunks always span whole GOPs so every chunk starts on a keyframe
+    chunk_length = -(-chunk_length // gop) * gop
+    if getattr(scene, 'vsendless_chunk_mode', 'OFF') == 'STRIPS':
+        cuts = {range_start, range_end}
+        for strip in timeline_data:
+            for frame in (strip.get("start_frame"), strip.get("end_frame")):
+                if frame is not None and range_start < frame < range_end:
+                    cuts.add(frame)
+        cuts = sorted(cuts)
+    else:
+        # Fixed chunks are anchored to absolute frame numbers so boundaries stay
+        # put when the scene range changes
+        first = (range_start // chunk_length + 1) * chunk_length
+        cuts = [range_start, *range(first, range_end, chunk_length), range_end]
+    pieces = []
+    for start, end in zip(cuts, cuts[1:]):
+        if pieces and (end - start < gop or pieces[-1][1] - pieces[-1][0] < gop):
+            # Fold slivers shorter than a GOP into their neighbour
+            pieces[-1] = (pieces[-1][0], end)
+        else:
+            pieces.append((start, end))
+    segments = []
+    for start, end in pieces:
+        while end - start >= chunk_length + gop:
+            segments.append((start, start + chunk_length))
+            start += chunk_length
+        segments.append((start, end))
+    logger.info("Planned %d render segments", len(segments))
+    return segments
+
+class RenderSegment:
+    def __init__(self, index, start, end, output_path, command, cache_key=None, piped_strip=None, stream_copy=False):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.output_path = output_path
+        self.command = command
+        self.cache_key = cache_key
+        self.piped_strip = piped_strip
+        self.stream_copy = stream_copy
+        self.process = None
+        self.attempts = 0
+        self.done = command is None
+
+    @property
+    def frame_count(self):
+        return self.end - self.start
+
+    @property
+    def frame(self):
+        if self.done:
+            return self.frame_count
+        return min(self.process.frame, self.frame_count) if self.process else 0
+
+class SegmentedRender(RenderJob):
+    def __init__(self, scene, timeline_data, output_path, segments, workers=4, retries=2, cache=None, threads=None):
+        self.output_path = output_path
+        self.work_dir = f"{output_path}.segments"
+        extension = os.path.splitext(output_path)[1] or ".mp4"
+        self.workers = max(workers, 1)
+        self.encoders = self.workers
+        self.threads = threads * self.workers if threads else 0
+        self.retries = max(retries, 0)
+        self.cache = cache
+        self.segments = []
+        encode_settings = get_encode_settings(scene) if cache else None
+        self.resolution = get_output_resolution(scene)
+        # Commands are built up front: bpy data must not be touched from workers
+        for index, segment in enumerate(segments):
+            start, end, copy_source, piped_strip = (*segment, None, None)[:4]
+            segment_path = os.path.join(self.work_dir, f"segment_{index:05d}{extension}")
+            if piped_strip:
+                # Blender-drawn frames can't be keyed, so these are never cached
+                command = construct_ffmpeg_command(
+                    scene, timeline_data, segment_path, frame_range=(start, end), piped_strip=piped_strip, threads=threads
+                )
+                if not command:
+                    raise ValueError(f"Failed to build FFmpeg command for frames {start}-{end}")
+                self.segments.append(RenderSegment(index, start, end, segment_path, command, piped_strip=piped_strip))
+                continue
+            if copy_source:
+                command = build_stream_copy_command(copy_source, segment_path)
+                self.segments.append(RenderSegment(index, start, end, segment_path, command, stream_copy=True))
+                continue
+            cache_key = None
+            if cache:
+                cache_key = compute_segment_key(scene, timeline_data, start, end, encode_settings)
+                cached_path = cache.lookup(cache_key)
+                if cached_path:
+                    self.segments.append(RenderSegment(index, start, end, cached_path, None, cache_key))
+                    continue
+            command = construct_ffmpeg_command(scene, timeline_data, segment_path, frame_range=(start, end), threads=threads)
+            if not command:
+                raise ValueError(f"Failed to build FFmpeg command for frames {start}-{end}")
+            self.segments.append(RenderSegment(index, start, end, segment_path, command, cache_key))
+        reused = sum(1 for segment in self.segments if segment.done)
+        if cache:
+            logger.info("Segment cache: reusing %d/%d segments", reused, len(self.segments))
+        self.total_frames = sum(segment.frame_count for segment in self.segments)
+        self.stderr_tail = collections.deque(maxlen=FFMPEG_STDERR_TAIL_LINES)
+        self.cancelled = False
+        self.returncode = None
+        self._concat = None
+        self._cancel_event = threading.Event()
+        self._coordinator = None
+
+    def start(self):
+        os.makedirs(self.work_dir, exist_ok=True)
+        self._coordinator = threading.Thread(target=self._run, daemon=True)
+        self._coordinator.start()
+        return self
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self._encode_segment, self.segments))
+        if self._cancel_event.is_set():
+            self.returncode = -1
+        elif not all(results):
+            self.returncode = 1
+        else:
+            self.returncode = self._join_segments()
+
+    def _encode_segment(self, segment):
+        if segment.done:
+            return True
+        while segment.attempts <= self.retries and not self._cancel_event.is_set():
+            segment.attempts += 1
+            if segment.piped_strip:
+                segment.process = PipedFFmpegProcess(
+                    segment.command, segment.piped_strip, segment.start, segment.end, self.resolution
+                )
+            else:
+                segment.process = FFmpegProcess(segment.command, total_frames=segment.frame_count)
+            try:
+                segment.process.start()
+            except OSError as e:
+                self.stderr_tail.append(f"[segment {segment.index}] {e}")
+                return False
+            returncode = segment.process.wait(cancel_check=self._cancel_event.is_set)
+            if returncode == 0 and segment.stream_copy and segment.process.frame != segment.frame_count:
+                # A copy of the wrong length would shift every later segment
+                # (and the audio) in the joined output; retrying can't fix it
+                self.stderr_tail.append(
+                    f"[segment {segment.index}] stream copy produced {segment.process.frame} frames, "
+                    f"expected {segment.frame_count}"
+                )
+                return False
+            if returncode == 0 and not segment.process.cancelled:
+                if self.cache and segment.cache_key:
+                    try:
+                        self.cache.store(segment.cache_key, segment.output_path)
+                    except OSError as e:
+                        logger.warning("Could not cache segment %d: %s", segment.index, e)
+                segment.done = True
+                return True
+            if segment.process.cancelled:
+                return False
+            logger.warning("Segment %d (frames %d-%d) failed, attempt %d/%d",
+                           segment.index, segment.start, segment.end, segment.attempts, self.retries + 1)
+            self.stderr_tail.extend(f"[segment {segment.index}] {line}" for line in segment.process.stderr_tail)
+        return False
+
+    def _join_segments(self):
+        list_path = os.path.join(self.work_dir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as list_file:
+            for segment in self.segments:
+                escaped = segment.output_path.replace("'", "'\\''")
+                list_file.write(f"file '{escaped}'\n")
+        command = [get_ffmpeg_path(), "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-y", self.output_path]
+        self._concat = FFmpegProcess(command, total_frames=self.total_frames)
+        try:
+            self._concat.start()
+        except OSError as e:
+            self.stderr_tail.append(f"[concat] {e}")
+            return 1
+        returncode = self._concat.wait(cancel_check=self._cancel_event.is_set)
+        if returncode != 0:
+            self.stderr_tail.extend(f"[concat] {line}" for line in self._concat.stderr_tail)
+            return returncode
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        if self.cache:
+            self.cache.evict(keep={segment.cache_key for segment in self.segments})
+        return 0
+
+    @property
+    def frame(self):
+        return sum(segment.frame for segment in self.segments)
+
+    def status_text(self):
+        done = sum(1 for segment in self.segments if segment.done)
+        if self._concat is not None:
+            return f"Joining {len(self.segments)} segments"
+        return f"Segments {done}/{len(self.segments)} | Frame {self.frame}/{self.total_frames}"
+
+    def poll(self):
+        # Piped segments are drawn here: poll() runs on Blender's main thread
+        for segment in self.segments:
+            if isinstance(segment.process, PipedFFmpegProcess):
+                segment.process.pump()
+        if self._coordinator is not None and self._coordinator.is_alive():
+            return None
+        return self.returncode
+
+    def cancel(self):
+        if self.poll() is not None:
+            return
+        self.cancelled = True
+        self._cancel_event.set()
+        self._coordinator.join()
+
+    def error_report(self):
+        return "\n".join(self.stderr_tail)
+
+    def ffmpeg_processes(self):
+        processes = [segment.process for segment in self.segments if segment.process is not None]
+        return processes + ([self._concat] if self._concat is not None else [])
+
+# ==============================================================================
+# MULTI-PASS ENCODING
+# ==============================================================================
+# Software 2-pass runs as dependent FFmpeg stages: an optional lossless
+# intermediate of the filtered timeline, a fast stats-only first pass to a null
+# muxer, then the real encode
+
+class StagedRender(RenderJob):
+    def __init__(self, stages, work_dir=None, threads=0):
+        # stages: [(label, command, total_frames)], run strictly in order
+        self.stages = stages
+        self.work_dir = work_dir
+        self.threads = threads or 0
+        self.total_frames = sum(frames for _, _, frames in stages)
+        self.cancelled = False
+        self.returncode = None
+        self._index = 0
+        self._completed_frames = 0
+        self._process = None
+        self._processes = []
+
+    def start(self):
+        self._start_stage()
+        return self
+
+    def _start_stage(self):
+        label, command, frames = self.stages[self._index]
+        logger.info("Stage %d/%d: %s", self._index + 1, len(self.stages), label)
+        self._process = FFmpegProcess(command, total_frames=frames).start()
+        self._processes.append(self._process)
+
+    @property
+    def frame(self):
+        return self._completed_frames + (self._process.frame if self._process else 0)
+
+    def status_text(self):
+        label = self.stages[self._index][0]
+        return f"{label} ({self._index + 1}/{len(self.stages)}) | {self._process.status_text()}"
+
+    def poll(self):
+        if self.returncode is not None:
+            return self.returncode
+        returncode = self._process.poll()
+        if returncode is None:
+            return None
+        if returncode != 0 or self.cancelled or self._index + 1 == len(self.stages):
+            self.returncode = returncode
+            if self.work_dir:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+            return returncode
+        self._completed_frames += self.stages[self._index][2]
+        self._index += 1
+        self._start_stage()
+        return None
+
+    def cancel(self):
+        if self.poll() is not None:
+            return
+        self.cancelled = True
+        self._process.cancel()
+        self.poll()
+
+    def error_report(self):
+        return self._process.error_report() if self._process else ""
+
+    def ffmpeg_processes(self):
+        return list(self._processes)
+
+def build_pass_command(scene, source, encoder, pass_number, passlog, output_path):
+    output_args = ["-f", "null", os.devnull] if pass_number == 1 else ["-y", output_path]
+    return [
+        get_ffmpeg_path(), "-i", source, "-map", "0:v",
+        *get_encoder_args(scene, encoder, pass_number, passlog),
+        *output_args
+    ]
+
+def create_multipass_render(scene, timeline_data, output_path, threads=None):
+    encoder = get_video_encoder(scene)
+    frames = get_timeline_frame_count(scene)
+    work_dir = f"{output_path}.passes"
+    os.makedirs(work_dir, exist_ok=True)
+    passlog = os.path.join(work_dir, "passlog")
+    stages = []
+    if uses_expensive_filters(scene, timeline_data):
+        # Denoise/stabilize/custom filters run once into a lossless intermediate
+        # instead of once per pass
+        intermediate = os.path.join(work_dir, "intermediate.mkv")
+        command = construct_ffmpeg_command(
+            scene, timeline_data, intermediate,
+            encoder_args=[*INTERMEDIATE_CODEC_ARGS, "-pix_fmt", get_output_pix_fmt(scene, encoder)],
+            threads=threads,
+        )
+        if not command:
+            return None
+        stages.append(("Filtering", command, frames))
+        for pass_number in (1, 2):
+            command = build_pass_command(scene, intermediate, encoder, pass_number, passlog, output_path)
+            stages.append((f"Pass {pass_number}", command, frames))
+    else:
+        for pass_number, target in ((1, os.devnull), (2, output_path)):
+            encoder_args = get_encoder_args(scene, encoder, pass_number, passlog)
+            if pass_number == 1:
+                encoder_args.extend(["-f", "null"])
+            command = construct_ffmpeg_command(scene, timeline_data, target, encoder_args=encoder_args, threads=threads)
+            if not command:
+                return None
+            stages.append((f"Pass {pass_number}", command, frames))
+    return StagedRender(stages, work_dir, threads)
+
+# ==============================================================================
+# SMART RENDER
+# ==============================================================================
+# Intervals that show a single untouched source already encoded like the output
+# are stream-copied between keyframes; only the partial GOPs at the edit points
+# are re-encoded
+
+CODEC_FAMILIES = {
+    'libx264': 'h264', 'h264_nvenc': 'h264', 'libx265': 'hevc', 'hevc_nvenc': 'hevc',
+    'prores_ks': 'prores', 'mpeg4': 'mpeg4',
+}
+
+def _normalize_profile(profile):
+    return (profile or "").lower().replace("constrained ", "").replace(" ", "")
+
+def is_stream_copyable(scene, strip):
+    if strip.get("type") != 'MOVIE' or strip.get("ffmpeg_filter") or strip.get("blend_alpha", 1.0) < 1.0:
+        return False
+    if any(getattr(scene, name, False) for name in ('enable_denoising', 'apply_stabilization', 'apply_lut')):
+        return False
+    probe = strip.get("probe") or {}
+    family = CODEC_FAMILIES.get(get_video_encoder(scene))
+    if not family or probe.get("codec") != family:
+        return False
+    expected_profile = {
+        'h264': getattr(scene, 'h264_profile', 'high'),
+        'hevc': getattr(scene, 'hevc_profile', 'main'),
+    }.get(family)
+    if expected_profile and _normalize_profile(probe.get("profile")) != expected_profile:
+        return False
+    return (
+        (probe.get("width"), probe.get("height")) == get_output_resolution(scene)
+        and probe.get("pix_fmt") == get_output_pix_fmt(scene, get_video_encoder(scene))
+        and abs(probe.get("fps", 0) - scene.render.fps) <= 0.001
+        and probe.get("sample_aspect_ratio") in ("1:1", "0:1")
+    )
+
+def probe_keyframes(path, start_time, end_time, origin=0.0):
+    # Times are relative to the file's start time (origin), like FFmpeg's -ss;
+    # -read_intervals and packet timestamps are absolute stream times
+    result = subprocess.run([
+        get_ffprobe_path(), "-v", "error", "-select_streams", "v:0",
+        "-read_intervals", f"{origin + start_time:.6f}%{origin + end_time:.6f}",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=120, check=False)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" not in flags:
+            continue
+        try:
+            pts = float(pts_time) - origin
+        except ValueError:
+            continue
+        if start_time - 1e-6 <= pts <= end_time + 1e-6:
+            keyframes.append(pts)
+    return sorted(keyframes)
+
+def _append_encode_segment(plan, start, end):
+    if end <= start:
+        return
+    if plan and len(plan[-1]) == 2 and plan[-1][1] == start:
+        plan[-1] = (plan[-1][0], end)
+    else:
+        plan.append((start, end))
+
+def plan_smart_render_segments(scene, timeline_data):
+    fps = scene.render.fps
+    min_copy = get_gop_size(scene)
+    intervals = compile_timeline_intervals(get_visual_strips(timeline_data), scene.frame_start, scene.frame_end + 1)
+    plan = []
+    for start, end, layers in intervals:
+        if len(layers) == 1 and end - start >= min_copy and is_stream_copyable(scene, layers[0]):
+            strip = layers[0]
+            source_start = (strip.get("frame_offset_start", 0) + start - strip["start_frame"]) / fps
+            source_end = source_start + (end - start) / fps
+            keyframes = probe_keyframes(
+                strip["filepath"], source_start, source_end, (strip.get("probe") or {}).get("start_time", 0.0)
+            )
+            if len(keyframes) >= 2:
+                copy_start = start + round((keyframes[0] - source_start) * fps)
+                copy_end = start + round((keyframes[-1] - source_start) * fps)
+                if copy_end - copy_start >= min_copy:
+                    _append_encode_segment(plan, start, copy_start)
+                    plan.append((copy_start, copy_end, {
+                        "path": strip["filepath"],
+                        "start_time": keyframes[0],
+                        "frames": copy_end - copy_start,
+                    }))
+                    _append_encode_segment(plan, copy_end, end)
+                    continue
+        _append_encode_segment(plan, start, end)
+    if getattr(scene, 'vsendless_chunk_mode', 'OFF') != 'OFF':
+        # Long re-encoded stretches are still split for the parallel workers
+        chunk_length = max(getattr(scene, 'vsendless_chunk_length', 600), 1)
+        chunk_length = -(-chunk_length // min_copy) * min_copy
+        split_plan = []
+        for segment in plan:
+            start, end = segment[:2]
+            while len(segment) == 2 and end - start >= chunk_length + min_copy:
+                split_plan.append((start, start + chunk_length))
+                start += chunk_length
+            split_plan.append((start, end, *segment[2:]))
+        plan = split_plan
+    copied = sum(segment[1] - segment[0] for segment in plan if len(segment) > 2)
+    logger.info("Smart render: %d/%d frames stream-copied", copied, scene.frame_end + 1 - scene.frame_start)
+    return plan
+
+def build_stream_copy_command(source, output_path):
+    # Cut by frame count: with B-frames, packets reordered past a -t cut would
+    # still be copied and lengthen the range
+    return [
+        get_ffmpeg_path(),
+        "-ss", f"{source['start_time']:.6f}", "-i", source["path"],
+        "-frames:v", str(source["frames"]),
+        "-map", "0:v:0", "-c", "copy",
+        "-video_track_timescale", str(SEGMENT_TIMESCALE),
+        "-avoid_negative_ts", "make_zero",
+        "-y", output_path
+    ]
+
+def create_video_job(scene, timeline_data, output_path, cache=None, budget=None):
+    budget = budget or get_resource_budget(scene)
+    piped_ranges = plan_piped_ranges(scene, timeline_data)
+    if any(piped for _, _, piped in piped_ranges):
+        if scene_strip_rendering_available():
+            # Pure ranges stay plain FFmpeg segments (and use the cache); only
+            # ranges showing a SCENE strip wait on Blender
+            return create_segmented_render(
+                scene, timeline_data, output_path,
+                [(start, end, None, piped) for start, end, piped in piped_ranges], budget, cache,
+            )
+        logger.warning("SCENE strips are drawn from a 3D viewport and are left out here; "
+                       "render with the VSEndless Render operator to include them")
+    if getattr(scene, 'vsendless_smart_render', False):
+        plan = plan_smart_render_segments(scene, timeline_data)
+        if any(len(segment) > 2 for segment in plan):
+            return create_segmented_render(scene, timeline_data, output_path, plan, budget, cache)
+        logger.info("Smart render: no interval can be stream-copied, encoding normally")
+    # The segment cache needs segments, so it implies fixed-length segmenting
+    if cache or getattr(scene, 'vsendless_chunk_mode', 'OFF') != 'OFF':
+        segments = plan_render_segments(scene, timeline_data)
+        if len(segments) > 1 or cache:
+            if uses_software_multipass(scene, get_video_encoder(scene)):
+                logger.info("2-pass encoding is not used for segmented renders")
+            return create_segmented_render(scene, timeline_data, output_path, segments, budget, cache)
+    whole_range = [(scene.frame_start, scene.frame_end + 1)]
+    pieces, _, _ = schedule_segments(scene, timeline_data, whole_range, budget)
+    if len(pieces) > 1:
+        # Too many sources for one process: run it as sub-processes that fit
+        logger.info("Timeline exceeds the resource budget in one process, splitting it into %d", len(pieces))
+        if uses_software_multipass(scene, get_video_encoder(scene)):
+            logger.info("2-pass encoding is not used for segmented renders")
+        return create_segmented_render(scene, timeline_data, output_path, whole_range, budget, cache)
+    if uses_software_multipass(scene, get_video_encoder(scene)):
+        return create_multipass_render(scene, timeline_data, output_path, budget.threads)
+    ffmpeg_cmd = construct_ffmpeg_command(scene, timeline_data, output_path, threads=budget.threads)
+    if not ffmpeg_cmd:
+        return None
+    return FFmpegProcess(ffmpeg_cmd, total_frames=get_timeline_frame_count(scene), threads=budget.threads)
+
+def create_render_job(scene, timeline_data, output_path, budget=None):
+    cache = open_segment_cache(scene)
+    audio_strips = get_audio_strips(timeline_data)
+    if not audio_strips:
+        return create_video_job(scene, timeline_data, output_path, cache, budget)
+    video_path = f"{output_path}.video{get_output_extension(scene)}"
+    video_job = create_video_job(scene, timeline_data, video_path, cache, budget)
+    if not video_job:
+        return None
+    return AudioMuxRender(scene, audio_strips, video_job, video_path, output_path, cache)
+
+# ==============================================================================
+# AUDIO PIPELINE
+# ==============================================================================
+# SOUND strips are mixed into their own AAC file by a separate FFmpeg process that
+# runs alongside the video encode; the two are joined by stream copy at the end,
+# so audio edits never re-encode video (with the segment cache on, not even the
+# unchanged video segments) and a cached mix is reused for video-only edits
+
+AUDIO_CACHE_VERSION = 1
+AUDIO_SAMPLE_RATE = 48000
+AUDIO_BITRATE = "192k"
+
+def get_audio_strips(timeline_data):
+    return [
+        strip for strip in timeline_data
+        if strip.get("type") == 'SOUND' and strip.get("filepath") and strip.get("volume", 1.0) > 0
+        and (strip.get("probe") or {}).get("audio_streams", 1) > 0
+    ]
+
+def compute_audio_key(scene, audio_strips):
+    strips = [
+        {**{key: value for key, value in strip.items() if key != "name"}, "file": cached_file_signature(strip["filepath"])}
+        for strip in audio_strips
+    ]
+    strips.sort(key=lambda entry: (entry.get("channel", 0), entry.get("start_frame", 0)))
+    payload = {
+        "version": AUDIO_CACHE_VERSION,
+        "range": [scene.frame_start, scene.frame_end + 1],
+        "fps": scene.render.fps,
+        "strips": strips,
+        "encode": [AUDIO_SAMPLE_RATE, AUDIO_BITRATE],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return "audio_" + hashlib.sha256(encoded).hexdigest()
+
+def build_audio_command(scene, audio_strips, output_path):
+    fps = scene.render.fps
+    range_start, range_end = scene.frame_start, scene.frame_end + 1
+    inputs = []
+    filters = []
+    labels = []
+    for strip in audio_strips:
+        start = max(strip["start_frame"], range_start)
+        end = min(strip["end_frame"], range_end)
+        if end <= start:
+            continue
+        source_in = strip.get("frame_offset_start", 0) + start - strip["start_frame"]
+        seek = ["-ss", f"{source_in / fps:.6f}"] if source_in > 0 else []
+        index = len(labels)
+        inputs.extend([*seek, "-t", f"{(end - start) / fps:.6f}", "-i", strip["filepath"]])
+        delay_ms = round((start - range_start) * 1000 / fps)
+        filters.append(
+            f"[{index}:a:0]aresample={AUDIO_SAMPLE_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo,"
+            f"volume={strip.get('volume', 1.0):g},adelay={delay_ms}:all=1[a{index}]"
+        )
+        labels.append(f"[a{index}]")
+    if not labels:
+        return []
+    mix = labels[0]
+    if len(labels) > 1:
+        # normalize=0 sums strips at their own volume, like Blender's mixer
+        filters.append(f"{''.join(labels)}amix=inputs={len(labels)}:duration=longest:normalize=0[mix]")
+        mix = "[mix]"
+    # Padded/cut to the exact timeline length so the mux never shortens the video
+    filters.append(f"{mix}apad,atrim=end={(range_end - range_start) / fps:.6f}[outa]")
+    return [
+        get_ffmpeg_path(),
+        *inputs,
+        "-filter_complex", ";".join(filters),
+        "-map", "[outa]",
+        "-c:a", "aac", "-b:a", AUDIO_BITRATE,
+        "-y", output_path
+    ]
+
+def build_mux_command(video_path, audio_path, output_path):
+    return [
+        get_ffmpeg_path(),
+        "-i", video_path, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0", "-c", "copy",
+        "-movflags", "+faststart",
+        "-y", output_path
+    ]
+
+class AudioMuxRender(RenderJob):
+    def __init__(self, scene, audio_strips, video_job, video_path, output_path, cache=None):
+        self.video_job = video_job
+        self.video_path = video_path
+        self.output_path = output_path
+        self.cache = cache
+        self.total_frames = video_job.total_frames
+        self.cancelled = False
+        self.returncode = None
+        self.audio_key = compute_audio_key(scene, audio_strips) if cache else None
+        self.audio_path = cache.lookup(self.audio_key) if cache else None
+        self.audio = None
+        if self.audio_path:
+            logger.info("Audio cache: reusing mixed audio")
+        else:
+            self.audio_path = f"{output_path}.audio.m4a"
+            command = build_audio_command(scene, audio_strips, self.audio_path)
+            if not command:
+                raise ValueError("Failed to build audio mix command")
+            self.audio = FFmpegProcess(command)
+        self._mux = None
+
+    def start(self):
+        self.video_job.start()
+        if self.audio is not None:
+            self.audio.start()
+        return self
+
+    @property
+    def frame(self):
+        return self.video_job.frame
+
+    @property
+    def encoders(self):
+        # The AAC mix is a single light process next to the video encoders
+        return self.video_job.encoders
+
+    @property
+    def threads(self):
+        return self.video_job.threads
+
+    def status_text(self):
+        if self._mux is not None:
+            return "Muxing audio"
+        return self.video_job.status_text()
+
+    def poll(self):
+        if self.returncode is not None:
+            return self.returncode
+        if self._mux is None:
+            video_returncode = self.video_job.poll()
+            audio_returncode = self.audio.poll() if self.audio is not None else 0
+            failed = [code for code in (video_returncode, audio_returncode) if code not in (None, 0)]
+            if failed or (self.cancelled and None in (video_returncode, audio_returncode)):
+                # One side failing makes the other pointless
+                self.video_job.cancel()
+                if self.audio is not None:
+                    self.audio.cancel()
+                return self._finish(failed[0] if failed else 1)
+            if None in (video_returncode, audio_returncode):
+                return None
+            if self.cancelled:
+                return self._finish(1)
+            if self.audio is not None and self.cache:
+                self.cache.store(self.audio_key, self.audio_path)
+            self._mux = FFmpegProcess(build_mux_command(self.video_path, self.audio_path, self.output_path))
+            self._mux.start()
+            return None
+        returncode = self._mux.poll()
+        if returncode is None:
+            return None
+        return self._finish(returncode)
+
+    def _finish(self, returncode):
+        self.returncode = returncode
+        for path in (self.video_path, self.audio_path if self.audio is not None else None):
+            if path and os.path.exists(path):
+                os.remove(path)
+        return returncode
+
+    def cancel(self):
+        if self.poll() is not None:
+            return
+        self.cancelled = True
+        self.video_job.cancel()
+        if self.audio is not None:
+            self.audio.cancel()
+        if self._mux is not None:
+            self._mux.cancel()
+        self.poll()
+
+    def error_report(self):
+        reports = [self.video_job.error_report()]
+        for name, process in (("audio", self.audio), ("mux", self._mux)):
+            if process is not None and process.poll():
+                reports.append(f"[{name}] {process.error_report()}")
+        return "\n".join(report for report in reports if report)
+
+    def ffmpeg_processes(self):
+        extra = [process for process in (self.audio, self._mux) if process is not None]
+        return self.video_job.ffmpeg_processes() + extra
+
+# ==============================================================================
+# RENDER PROFILING
+# ==============================================================================
+# Wall time of every pipeline stage, FFmpeg's own -benchmark and -progress figures
+# per process and progress samples over the run. Written next to the output as
+# <output>.profile.json / .profile.csv when "Profile Render" is on
+
+PROFILE_SAMPLE_INTERVAL = 1.0
+FILTER_NAME_PATTERN = re.compile(r"(?:^|[;,\]])\s*([a-z_0-9]+)(?==|,|;|\[|$)")
+
+# Summary of the most recent render, drawn by VSEndlessRenderSettingsPanel
+last_render_profile = []
+
+def filter_histogram(command):
+    if "-filter_complex" not in command:
+        return {}
+    graph = command[command.index("-filter_complex") + 1]
+    histogram = collections.Counter(FILTER_NAME_PATTERN.findall(re.sub(r"'[^']*'", "", graph)))
+    return dict(histogram.most_common())
+
+class RenderProfile:
+    def __init__(self, output_path, enabled=False):
+        self.output_path = output_path
+        self.enabled = enabled
+        self.stages = []
+        self.samples = []
+        self.started = time.perf_counter()
+        self._render_started = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({"stage": name, "seconds": time.perf_counter() - started})
+
+    def begin_render(self):
+        self._render_started = time.perf_counter()
+
+    def sample(self, job):
+        now = time.perf_counter() - self.started
+        if self.samples and now - self.samples[-1]["time"] < PROFILE_SAMPLE_INTERVAL:
+            return
+        previous = self.samples[-1] if self.samples else {"time": now, "frame": job.frame}
+        elapsed = now - previous["time"]
+        fps = (job.frame - previous["frame"]) / elapsed if elapsed > 0 else 0.0
+        self.samples.append({"time": round(now, 3), "frame": job.frame, "fps": round(fps, 2)})
+
+    def finish(self, job, returncode):
+        render_seconds = time.perf_counter() - (self._render_started or self.started)
+        self.stages.append({"stage": "render", "seconds": render_seconds})
+        processes = []
+        for process in job.ffmpeg_processes() if job else []:
+            processes.append({
+                "output": process.command[-1],
+                "frames": process.frame,
+                "benchmark": process.benchmark(),
+                "progress": dict(process.progress),
+                "filters": filter_histogram(process.command),
+            })
+        report = {
+            "output": self.output_path,
+            "returncode": returncode,
+            "cancelled": bool(job and job.cancelled),
+            "frames": job.total_frames if job else 0,
+            "wall_seconds": time.perf_counter() - self.started,
+            "render_fps": (job.total_frames / render_seconds) if job and render_seconds > 0 else 0.0,
+            "stages": self.stages,
+            "ffmpeg": processes,
+            "samples": self.samples,
+        }
+        last_render_profile[:] = self.summary_lines(report)
+        if self.enabled and self.output_path:
+            self.write(report)
+        return report
+
+    def summary_lines(self, report):
+        lines = [f"{report['frames']} frames in {report['wall_seconds']:.1f}s ({report['render_fps']:.1f} fps)"]
+        lines.append(" | ".join(f"{stage['stage']} {stage['seconds']:.2f}s" for stage in report["stages"]))
+        cpu_seconds = sum(
+            process["benchmark"].get("utime_s", 0.0) + process["benchmark"].get("stime_s", 0.0)
+            for process in report["ffmpeg"]
+        )
+        real_seconds = sum(process["benchmark"].get("rtime_s", 0.0) for process in report["ffmpeg"])
+        peak_kib = max((process["benchmark"].get("maxrss_kib", 0.0) for process in report["ffmpeg"]), default=0.0)
+        if real_seconds > 0:
+            # Well under 100% per core usually means decode or disk, not filters, is the bottleneck
+            lines.append(
+                f"FFmpeg: {len(report['ffmpeg'])} processes, {cpu_seconds / real_seconds * 100:.0f}% CPU, "
+                f"{peak_kib / 1024:.0f} MiB peak"
+            )
+        return lines
+
+    def write(self, report):
+        base = os.path.splitext(self.output_path)[0]
+        try:
+            with open(f"{base}.profile.json", "w", encoding="utf-8") as profile_file:
+                json.dump(report, profile_file, indent=2)
+            with open(f"{base}.profile.csv", "w", encoding="utf-8", newline="") as samples_file:
+                writer = csv.DictWriter(samples_file, fieldnames=["time", "frame", "fps"])
+                writer.writeheader()
+                writer.writerows(self.samples)
+        except OSError as e:
+            logger.warning("Could not write render profile: %s", e)
+            return
+        print(f"[VSEndless] Render profile written: {base}.profile.json")
+
+def prepare_timeline(scene, profile):
+    with profile.stage("extract"):
+        timeline_data = get_timeline_model(scene).extract(scene)
+    with profile.stage("validate"):
+        timeline_data = validate_sequences(timeline_data)
+    with profile.stage("probe"):
+        timeline_data = probe_sequences(timeline_data)
+    if getattr(scene, 'apply_stabilization', False):
+        with profile.stage("stabilize"):
+            analyze_stabilization(scene, timeline_data)
+    return timeline_data
+
+# ==============================================================================
+# BATCH RENDER QUEUE
+# ==============================================================================
+# Headless rendering of many .blend files / scenes from a JSON manifest:
+#   blender -b --python vsendless_singlefile.py -- --batch manifest.json
+# Manifest: {"jobs": [{"blend": "ep01.blend", "scene": "Scene", "output": "//ep01.mp4"}]}
+# Job states are persisted next to the manifest so an interrupted queue resumes
+# without redoing finished jobs
+
+BATCH_THREADS_PER_JOB = 4
+NVENC_SESSIONS_PER_GPU = 3
+BATCH_POLL_INTERVAL = 0.5
+
+class BatchQueue:
+    def __init__(self, manifest_path, state_path=None, workers=None):
+        self.manifest_path = os.path.abspath(manifest_path)
+        self.base_dir = os.path.dirname(self.manifest_path)
+        self.state_path = os.path.abspath(state_path) if state_path else f"{self.manifest_path}.state.json"
+        self.jobs = self._load_manifest()
+        self.state = self._load_state()
+        self.workers = workers or max(1, (os.cpu_count() or 1) // BATCH_THREADS_PER_JOB)
+        self.threads = os.cpu_count() or 1
+        self.nvenc_sessions = NVENC_SESSIONS_PER_GPU * max(len(get_nvidia_gpus()), 1)
+
+    def _load_manifest(self):
+        with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        jobs = []
+        for entry in manifest.get("jobs", []) if isinstance(manifest, dict) else manifest:
+            blend = os.path.normpath(os.path.join(self.base_dir, entry["blend"]))
+            scene_name = entry.get("scene", "")
+            jobs.append({
+                "id": f"{blend}::{scene_name}",
+                "blend": blend,
+                "scene": scene_name,
+                "output": entry.get("output", ""),
+            })
+        return jobs
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as state_file:
+            json.dump(self.state, state_file, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def _set_state(self, job, **fields):
+        self.state.setdefault(job["id"], {}).update(fields, updated=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        self._save_state()
+
+    def pending_jobs(self):
+        pending = []
+        for job in self.jobs:
+            previous = self.state.get(job["id"], {})
+            if previous.get("state") == 'done' and os.path.exists(previous.get("output", "")):
+                logger.info("Skipping finished job %s", job["id"])
+                continue
+            # Jobs left 'running' by an interrupted queue are simply queued again
+            self._set_state(job, state='queued', error="")
+            pending.append(job)
+        return pending
+
+    def prepare(self, job):
+        # Opening the .blend and building commands has to happen on Blender's
+        # main thread; the prepared job only holds FFmpeg commands afterwards
+        bpy.ops.wm.open_mainfile(filepath=job["blend"])
+        scene = bpy.data.scenes.get(job["scene"]) if job["scene"] else bpy.context.scene
+        if scene is None:
+            raise ValueError(f"Scene '{job['scene']}' not found in {job['blend']}")
+        if job["output"]:
+            output_path = strip_output_extension(bpy.path.abspath(job["output"])) + get_output_extension(scene)
+        else:
+            output_path = resolve_output_path(scene)
+        profile = RenderProfile(output_path, getattr(scene, 'vsendless_profile_render', False))
+        timeline_data = prepare_timeline(scene, profile)
+        if not timeline_data:
+            raise ValueError("No valid sequences found for rendering.")
+        with profile.stage("build"):
+            # Up to self.workers jobs run at once, so each plans its processes
+            # within its share of the machine rather than all of it
+            budget = get_resource_budget(scene).share(self.workers)
+            render_job = create_render_job(scene, timeline_data, output_path, budget)
+        if not render_job:
+            raise ValueError("Failed to build FFmpeg command.")
+        return render_job, output_path, "nvenc" in get_video_encoder(scene), profile
+
+    def _job_threads(self, render_job):
+        # Processes left at FFmpeg's default thread count use every core
+        return min(render_job.threads or self.threads, self.threads)
+
+    def run(self):
+        queue = collections.deque()
+        for job in self.pending_jobs():
+            try:
+                render_job, output_path, uses_nvenc, profile = self.prepare(job)
+            except Exception as e:
+                logger.error("Batch job %s could not be prepared: %s", job["id"], e)
+                self._set_state(job, state='failed', error=str(e))
+                continue
+            queue.append((job, render_job, output_path, uses_nvenc, profile))
+        print(f"[VSEndless] Batch: {len(queue)} jobs queued, {self.workers} workers")
+        running = []
+        while queue or running:
+            # Segmented jobs run several encoders at once, so sessions and
+            # cores are counted per FFmpeg process rather than per job
+            nvenc_running = sum(entry[1].encoders for entry in running if entry[3])
+            threads_running = sum(self._job_threads(entry[1]) for entry in running)
+            for entry in list(queue):
+                if len(running) >= self.workers:
+                    break
+                job, render_job, output_path, uses_nvenc, profile = entry
+                nvenc_needed = render_job.encoders if uses_nvenc else 0
+                threads_needed = self._job_threads(render_job)
+                if running and (
+                    nvenc_running + nvenc_needed > self.nvenc_sessions
+                    or threads_running + threads_needed > self.threads
+                ):
+                    continue
+                queue.remove(entry)
+                try:
+                    profile.begin_render()
+                    render_job.start()
+                except Exception as e:
+                    self._set_state(job, state='failed', error=str(e))
+                    continue
+                self._set_state(job, state='running', output=output_path, started=time.time())
+                print(f"[VSEndless] Batch: started {job['id']}")
+                running.append((*entry, time.perf_counter()))
+                nvenc_running += nvenc_needed
+                threads_running += threads_needed
+            for entry in list(running):
+                job, render_job, output_path, _, profile, started = entry
+                returncode = render_job.poll()
+                if returncode is None:
+                    profile.sample(render_job)
+                    continue
+                running.remove(entry)
+                profile.finish(render_job, returncode)
+                wall_time = time.perf_counter() - started
+                if returncode == 0:
+                    fps = render_job.total_frames / wall_time if wall_time > 0 else 0.0
+                    self._set_state(job, state='done', wall_s=wall_time, fps=fps, error="")
+                    print(f"[VSEndless] Batch: finished {job['id']} in {wall_time:.1f}s ({fps:.1f} fps)")
+                else:
+                    self._set_state(job, state='failed', wall_s=wall_time, error=render_job.error_report()[-2000:])
+                    print(f"[VSEndless] Batch: FAILED {job['id']}")
+            time.sleep(BATCH_POLL_INTERVAL)
+        failed = [job["id"] for job in self.jobs if self.state.get(job["id"], {}).get("state") == 'failed']
+        print(f"[VSEndless] Batch complete: {len(self.jobs) - len(failed)}/{len(self.jobs)} jobs done")
+        return failed
+
+def run_batch_cli(argv):
+    parser = argparse.ArgumentParser(prog="blender -b --python vsendless_singlefile.py --")
+    parser.add_argument("--batch", required=True, metavar="MANIFEST", help="JSON manifest of .blend files and scenes")
+    parser.add_argument("--state", help="Job state file (default: <manifest>.state.json)")
+    parser.add_argument("--workers", type=int, help="Concurrent render jobs (default: CPU cores / 4)")
+    args = parser.parse_args(argv)
+    return BatchQueue(args.batch, args.state, args.workers).run()
+
 # ==============================================================================
 # BLENDER PROPERTIES REGISTRATION
 # ==============================================================================
@@ -288,10 +3354,10 @@ def register_properties():
         name="NVENC Preset",
         description="NVENC encoder preset (speed vs quality)",
         items=[
-            ('p1', "Slow (Best Quality)", ""),
-            ('p3', "Medium", ""),
-            ('p5', "Fast", ""),
-            ('p7', "Very Fast", "")
+            ('p1', "Fastest", ""),
+            ('p3', "Fast", ""),
+            ('p5', "Slow (Better Quality)", ""),
+            ('p7', "Slowest (Best Quality)", "")
         ],
         default='p3'
     )
@@ -401,6 +3467,114 @@ def register_properties():
         description="Path to the LUT file for color correction",
         subtype='FILE_PATH'
     )
+    bpy.types.Scene.vsendless_gop_size = bpy.props.IntProperty(
+        name="Keyframe Interval",
+        description="Frames between keyframes (GOP size); segment boundaries are aligned to it",
+        default=60,
+        min=1,
+        max=600
+    )
+    bpy.types.Scene.vsendless_chunk_mode = bpy.props.EnumProperty(
+        name="Segment Rendering",
+        description="Split the timeline into segments that are encoded in parallel",
+        items=[
+            ('OFF', "Off", "Encode the whole timeline in a single FFmpeg process"),
+            ('FIXED', "Fixed Length", "Split into fixed, GOP-aligned segments"),
+            ('STRIPS', "Strip Boundaries", "Split where strips start and end")
+        ],
+        default='OFF'
+    )
+    bpy.types.Scene.vsendless_chunk_length = bpy.props.IntProperty(
+        name="Segment Length",
+        description="Maximum segment length in frames (rounded up to whole GOPs)",
+        default=600,
+        min=1,
+        max=100000
+    )
+    bpy.types.Scene.vsendless_chunk_workers = bpy.props.IntProperty(
+        name="Parallel Encodes",
+        description="Number of FFmpeg processes encoding segments at the same time",
+        default=min(os.cpu_count() or 1, 4),
+        min=1,
+        max=64
+    )
+    bpy.types.Scene.vsendless_chunk_retries = bpy.props.IntProperty(
+        name="Segment Retries",
+        description="How many times a failed segment is re-encoded before the render fails",
+        default=2,
+        min=0,
+        max=10
+    )
+    bpy.types.Scene.vsendless_max_decoders = bpy.props.IntProperty(
+        name="Decoder Budget",
+        description="Most sources decoded at the same time across all FFmpeg processes; "
+                    "timelines with more are split into sub-processes",
+        default=16,
+        min=1,
+        max=256
+    )
+    bpy.types.Scene.vsendless_memory_budget_gb = bpy.props.FloatProperty(
+        name="Memory Budget (GB)",
+        description="Estimated frame buffer memory FFmpeg may use in total (0 = half of physical memory)",
+        default=0.0,
+        min=0.0,
+        max=1024.0
+    )
+    bpy.types.Scene.vsendless_thread_budget = bpy.props.IntProperty(
+        name="Thread Budget",
+        description="CPU threads shared by all FFmpeg processes (0 = all cores)",
+        default=0,
+        min=0,
+        max=256
+    )
+    bpy.types.Scene.vsendless_smart_render = bpy.props.BoolProperty(
+        name="Smart Render",
+        description="Stream-copy untouched footage that already matches the output and re-encode only around edits",
+        default=False
+    )
+    bpy.types.Scene.vsendless_use_segment_cache = bpy.props.BoolProperty(
+        name="Segment Cache",
+        description="Reuse encoded segments whose strips and settings did not change",
+        default=False
+    )
+    bpy.types.Scene.vsendless_cache_dir = bpy.props.StringProperty(
+        name="Cache Directory",
+        description="Where cached segments are stored (empty uses the system temp directory)",
+        default="",
+        subtype='DIR_PATH'
+    )
+    bpy.types.Scene.vsendless_cache_size_gb = bpy.props.FloatProperty(
+        name="Cache Size (GB)",
+        description="Least recently used segments are evicted above this size",
+        default=20.0,
+        min=0.1,
+        max=10000.0
+    )
+    bpy.types.Scene.vsendless_draft_mode = bpy.props.BoolProperty(
+        name="Draft Mode",
+        description="Fast preview render: reduced resolution, cheap denoising, no stabilization, fastest encoder preset",
+        default=False
+    )
+    bpy.types.Scene.vsendless_draft_scale = bpy.props.EnumProperty(
+        name="Draft Resolution",
+        description="Draft output size as a percentage of the render resolution",
+        items=[
+            ('25', "25%", "Quarter resolution"),
+            ('50', "50%", "Half resolution"),
+            ('75', "75%", "Three-quarter resolution")
+        ],
+        default='50'
+    )
+    bpy.types.Scene.vsendless_draft_use_proxies = bpy.props.BoolProperty(
+        name="Use Proxies",
+        description="Decode from Blender strip proxies (BL_proxy) when they exist at the draft size or larger",
+        default=True
+    )
+    bpy.types.Scene.vsendless_profile_render = bpy.props.BoolProperty(
+        name="Profile Render",
+        description="Write stage timings and FFmpeg statistics next to the output and show a summary here",
+        default=False
+    )
 
 # ==============================================================================
 # BLENDER OPERATORS
@@ -412,26 +3586,25 @@ class VSEndless_OT_CheckGPU(bpy.types.Operator):
     bl_label = "Check GPU Capabilities"
     bl_description = "Check for NVIDIA GPU and FFmpeg NVENC support"
 
+    refresh: bpy.props.BoolProperty(
+        name="Refresh",
+        description="Query nvidia-smi and FFmpeg again instead of using the cached results",
+        default=False
+    )
+
     def execute(self, context):
-        try:
-            result = subprocess.run([
-                "nvidia-smi", "--query-gpu=name,memory.total", "--format=csv,noheader,nounits"
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False)
-            if result.returncode == 0 and result.stdout:
-                gpu_info = result.stdout.strip()
-                self.report({'INFO'}, f"NVIDIA GPU detected: {gpu_info}")
-            else:
-                self.report({'WARNING'}, "No NVIDIA GPU detected or nvidia-smi not found.")
-        except Exception as e:
-            self.report({'ERROR'}, f"GPU check failed: {e}")
-        try:
-            ffmpeg_result = subprocess.run(["ffmpeg", "-encoders"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False)
-            if "nvenc" in ffmpeg_result.stdout:
-                self.report({'INFO'}, "FFmpeg NVENC support detected.")
-            else:
-                self.report({'WARNING'}, "FFmpeg NVENC support NOT detected.")
-        except Exception as e:
-            self.report({'ERROR'}, f"FFmpeg check failed: {e}")
+        gpus = get_nvidia_gpus(refresh=self.refresh)
+        if gpus:
+            self.report({'INFO'}, f"NVIDIA GPU detected: {', '.join(gpus)}")
+        else:
+            self.report({'WARNING'}, "No NVIDIA GPU detected or nvidia-smi not found.")
+        capabilities = get_ffmpeg_capabilities(refresh=self.refresh)
+        if not capabilities or not capabilities["encoders"]:
+            self.report({'ERROR'}, "FFmpeg check failed: FFmpeg not found or not responding.")
+        elif any("nvenc" in encoder for encoder in capabilities["encoders"]):
+            self.report({'INFO'}, "FFmpeg NVENC support detected.")
+        else:
+            self.report({'WARNING'}, "FFmpeg NVENC support NOT detected.")
         return {'FINISHED'}
 
 class VSEndless_OT_Render(bpy.types.Operator):
@@ -441,29 +3614,62 @@ class VSEndless_OT_Render(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
-        output_path = bpy.path.abspath(getattr(scene, 'vsendless_output_path', scene.render.filepath))
-        if not output_path.endswith(".mp4"):
-            output_path += ".mp4"
-        timeline_data = extract_timeline_data(scene)
-        timeline_data = validate_sequences(timeline_data)
+        output_path = resolve_output_path(scene)
+        self._profile = RenderProfile(output_path, getattr(scene, 'vsendless_profile_render', False))
+        timeline_data = prepare_timeline(scene, self._profile)
         if not timeline_data:
             self.report({'ERROR'}, "No valid sequences found in VSE!")
             return {'CANCELLED'}
-        ffmpeg_cmd = construct_ffmpeg_command(scene, timeline_data, output_path)
-        if not ffmpeg_cmd:
-            self.report({'ERROR'}, "Failed to build FFmpeg command!")
-            return {'CANCELLED'}
         try:
-            process = subprocess.run(ffmpeg_cmd, check=True, text=True, capture_output=True)
-            self.report({'INFO'}, f"Render complete: {output_path}")
-        except subprocess.CalledProcessError as e:
-            self.report({'ERROR'}, f"Render failed: {e.stderr}")
-            return {'CANCELLED'}
+            with self._profile.stage("build"):
+                self._process = create_render_job(scene, timeline_data, output_path)
+            if not self._process:
+                self.report({'ERROR'}, "Failed to build FFmpeg command!")
+                return {'CANCELLED'}
+            self._profile.begin_render()
+            self._process.start()
         except Exception as e:
             self.report({'ERROR'}, f"Unexpected error: {e}")
             return {'CANCELLED'}
+        self._output_path = output_path
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.25, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._process.cancel()
+        elif event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        returncode = self._process.poll()
+        if returncode is None:
+            self._profile.sample(self._process)
+            context.window_manager.progress_update(int(self._process.fraction * 100))
+            context.workspace.status_text_set(f"VSEndless: {self._process.status_text()} (Esc to cancel)")
+            return {'RUNNING_MODAL'}
+        self._finish(context)
+        self._profile.finish(self._process, returncode)
+        if self._process.cancelled:
+            self.report({'WARNING'}, f"Render cancelled: {self._output_path}")
+            return {'CANCELLED'}
+        if returncode != 0:
+            self.report({'ERROR'}, f"Render failed: {self._process.error_report()}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Render complete: {self._output_path}")
         return {'FINISHED'}
 
+    def cancel(self, context):
+        self._process.cancel()
+        self._finish(context)
+
+    def _finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
 # ==============================================================================
 # USER INTERFACE PANELS
 # ==============================================================================
@@ -510,6 +3716,29 @@ class VSEndlessRenderSettingsPanel(bpy.types.Panel):
         layout.prop(scene, "apply_stabilization")
         layout.prop(scene, "apply_lut")
         layout.prop(scene, "lut_file_path")
+        layout.prop(scene, "vsendless_gop_size")
+        layout.prop(scene, "vsendless_chunk_mode")
+        if scene.vsendless_chunk_mode != 'OFF' or scene.vsendless_use_segment_cache:
+            layout.prop(scene, "vsendless_chunk_length")
+            layout.prop(scene, "vsendless_chunk_workers")
+            layout.prop(scene, "vsendless_chunk_retries")
+        layout.prop(scene, "vsendless_max_decoders")
+        layout.prop(scene, "vsendless_memory_budget_gb")
+        layout.prop(scene, "vsendless_thread_budget")
+        layout.prop(scene, "vsendless_smart_render")
+        layout.prop(scene, "vsendless_use_segment_cache")
+        if scene.vsendless_use_segment_cache:
+            layout.prop(scene, "vsendless_cache_dir")
+            layout.prop(scene, "vsendless_cache_size_gb")
+        layout.prop(scene, "vsendless_draft_mode")
+        if scene.vsendless_draft_mode:
+            layout.prop(scene, "vsendless_draft_scale")
+            layout.prop(scene, "vsendless_draft_use_proxies")
+        layout.prop(scene, "vsendless_profile_render")
+        if scene.vsendless_profile_render and last_render_profile:
+            box = layout.box()
+            for line in last_render_profile:
+                box.label(text=line)
 
 # ==============================================================================
 # BLENDER REGISTRATION SYSTEM
@@ -524,8 +3753,10 @@ def register():
     register_properties()
     for cls in [VSEndlessRenderEngine, VSEndlessRenderSettingsPanel, VSEndless_OT_Render, VSEndless_OT_CheckGPU]:
         bpy.utils.register_class(cls)
+    register_timeline_handlers()
 
 def unregister():
+    unregister_timeline_handlers()
     for cls in [VSEndlessRenderEngine, VSEndlessRenderSettingsPanel, VSEndless_OT_Render, VSEndless_OT_CheckGPU]:
         bpy.utils.unregister_class(cls)
     # Remove properties
@@ -535,7 +3766,11 @@ def unregister():
         'use_hwaccel', 'hwaccel_method', 'nvenc_preset', 'nvenc_tune', 'h264_profile', 'hevc_profile',
         'rate_control_mode', 'constant_quality_level', 'use_multipass', 'use_gpu_scaling', 'use_gpu_denoising',
         'denoise_strength', 'use_gpu_stabilization', 'ffmpeg_custom_fps', 'ffmpeg_frame_rate', 'ffmpeg_aspect_ratio',
-        'enable_denoising', 'apply_stabilization', 'apply_lut', 'lut_file_path'
+        'enable_denoising', 'apply_stabilization', 'apply_lut', 'lut_file_path',
+        'vsendless_gop_size', 'vsendless_chunk_mode', 'vsendless_chunk_length', 'vsendless_chunk_workers',
+        'vsendless_chunk_retries', 'vsendless_max_decoders', 'vsendless_memory_budget_gb', 'vsendless_thread_budget',
+        'vsendless_smart_render', 'vsendless_use_segment_cache', 'vsendless_cache_dir', 'vsendless_cache_size_gb',
+        'vsendless_draft_mode', 'vsendless_draft_scale', 'vsendless_draft_use_proxies', 'vsendless_profile_render'
     ]:
         if hasattr(bpy.types.Scene, prop):
             delattr(bpy.types.Scene, prop)
@@ -552,6 +3787,9 @@ if __name__ == "__main__":
     register()
     print(f"[VSEndless] Render Engine v{__version__} loaded successfully!")
     print("[VSEndless] Go to Render Properties > Render Engine > VSEndless")
+    script_args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if "--batch" in script_args:
+        sys.exit(1 if run_batch_cli(script_args) else 0)
 else:
     # For import-style usage
     register()